@@ -0,0 +1,241 @@
+"""
+Archive of the events written by `EventMonitor`.
+
+The chunks of events are appended one after the other to a single file, which ends with an index of the
+chunks: their time range, range of human ids and event types. A reader only loads the chunks that can hold
+the events of a query.
+
+    record = RECORD_MAGIC | header length (u32) | header (json) | payload
+    footer = index (json) | index offset (u64) | index length (u32) | INDEX_MAGIC
+
+A chunk is written over the footer of the archive, followed by the new footer, so that the records already
+written are never modified. If a write is interrupted before its footer, the records are found again by
+scanning them from the start of the file.
+
+Encounter columns written uncompressed (UNCOMPRESSED_COLUMNS) are raw arrays aligned on ALIGNMENT bytes of the
+file, which `ArchiveReader` memory-maps: reading them neither copies nor deserializes them, and processes
+reading the same archive share its pages.
+"""
+import datetime
+import json
+import os
+import pickle
+import struct
+
+import numpy as np
+
+from config import TICK_MINUTE
+from encounters import DiseaseCourses, _human_id, dumps_columns, is_deferred, iter_encounter_events, loads_columns
+
+RECORD_MAGIC = b'EVRC'
+INDEX_MAGIC = b'EVIX'
+_HEADER = struct.Struct('<4sI')
+_FOOTER = struct.Struct('<QI4s')
+
+# formats of the chunks
+EVENTS = 'events'  # pickled list of event dicts
+COLUMNS = 'columns'  # encounter columns (see encounters.py)
+ARRAYS = 'arrays'  # uncompressed encounter columns
+COURSES = 'courses'  # pickled `DiseaseCourses`, needed to read the deferred encounter columns
+
+ALIGNMENT = 64
+_TIME_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
+
+
+def _dumps_arrays(columns):
+    """ Layout and bytes of the columns, one after the other, each starting on ALIGNMENT bytes """
+    layout, buffers, offset = {}, [], 0
+    for name, column in columns.items():
+        data = np.ascontiguousarray(column).tobytes()
+        layout[name] = {'dtype': column.dtype.str, 'shape': list(column.shape), 'offset': offset}
+        padding = -len(data) % ALIGNMENT
+        buffers += [data, bytes(padding)]
+        offset += len(data) + padding
+    return layout, b''.join(buffers)
+
+
+def _chunk_entry(data, uncompressed=False):
+    """ Format, payload and index entry of a chunk """
+    if isinstance(data, DiseaseCourses):
+        return COURSES, pickle.dumps(data), {}
+
+    if isinstance(data, dict):
+        if is_deferred(data):
+            initial_timestamp = data['initial_timestamp'].tolist()
+            ticks = data['tick']
+            times = [initial_timestamp + datetime.timedelta(minutes=tick * TICK_MINUTE) for tick in [ticks.min(), ticks.max()]] if len(ticks) else []
+        else:
+            times = data['time'].tolist()
+        human_ids = np.concatenate([data['human1_id'], data['human2_id']]).tolist()
+        entry = {'n_events': 2 * len(data['human1_id']), 'event_types': ['encounter'], **_ranges(times, human_ids)}
+        if uncompressed:
+            layout, payload = _dumps_arrays(data)
+            return ARRAYS, payload, {**entry, 'columns': layout}
+        return COLUMNS, dumps_columns(data), entry
+
+    times = [event['time'] for event in data]
+    human_ids = [_human_id(event['human_id']) for event in data]
+    entry = {'n_events': len(data), 'event_types': sorted({event['event_type'] for event in data})}
+    return EVENTS, pickle.dumps(data), {**entry, **_ranges(times, human_ids)}
+
+
+def _ranges(times, human_ids):
+    if not human_ids:
+        return {'start': None, 'end': None, 'human_min': None, 'human_max': None}
+    return {'start': min(times).strftime(_TIME_FORMAT), 'end': max(times).strftime(_TIME_FORMAT),
+            'human_min': min(human_ids), 'human_max': max(human_ids)}
+
+
+def _read_index(f):
+    """ Index of the archive and offset of its footer, from the footer or else from a scan of the records """
+    size = f.seek(0, os.SEEK_END)
+    if size >= _FOOTER.size:
+        f.seek(size - _FOOTER.size)
+        offset, length, magic = _FOOTER.unpack(f.read(_FOOTER.size))
+        if magic == INDEX_MAGIC and offset + length + _FOOTER.size == size:
+            f.seek(offset)
+            return json.loads(f.read(length)), offset
+
+    index, position = [], 0
+    while position + _HEADER.size <= size:
+        f.seek(position)
+        magic, length = _HEADER.unpack(f.read(_HEADER.size))
+        if magic != RECORD_MAGIC:
+            break
+        header = f.read(length)
+        if len(header) < length:
+            break
+        entry = json.loads(header)
+        entry['offset'] = position + _HEADER.size + length
+        if entry['offset'] + entry['length'] > size:
+            break
+        index.append(entry)
+        position = entry['offset'] + entry['length']
+    return index, position
+
+
+def append_chunk(path, data, uncompressed=False):
+    """
+    Appends the chunk `data` (a list of events, encounter columns or `DiseaseCourses`) to the archive at `path`;
+    encounter columns are written `uncompressed` to be memory-mapped
+    """
+    chunk_format, payload, entry = _chunk_entry(data, uncompressed)
+    entry = {'format': chunk_format, 'length': len(payload), **entry}
+    header = json.dumps(entry).encode()
+
+    with open(path, 'r+b' if os.path.exists(path) else 'w+b') as f:
+        index, position = _read_index(f)
+        # pads the header so that the payload starts on ALIGNMENT bytes
+        header += b' ' * (-(position + _HEADER.size + len(header)) % ALIGNMENT)
+        f.seek(position)
+        f.write(_HEADER.pack(RECORD_MAGIC, len(header)))
+        f.write(header)
+        entry['offset'] = f.tell()
+        f.write(payload)
+        index.append(entry)
+
+        offset = f.tell()
+        footer = json.dumps(index).encode()
+        f.write(footer)
+        f.write(_FOOTER.pack(offset, len(footer), INDEX_MAGIC))
+        f.truncate()
+
+
+class ArchiveReader(object):
+    """
+    Random access to the chunks of an archive through its index. Chunks are read in the order of their time range.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.index, _ = _read_index(f)
+        self._courses = None
+        self._map = None
+
+    def __len__(self):
+        return sum(entry.get('n_events', 0) for entry in self.index)
+
+    def select(self, start=None, end=None, human_ids=None, event_types=None):
+        """ Entries of the chunks that can hold events between `start` and `end`, of `human_ids` or of `event_types` """
+        if human_ids is not None:
+            human_ids = [_human_id(x) if isinstance(x, str) else x for x in human_ids]
+        entries = []
+        for entry in self.index:
+            if entry['format'] == COURSES or entry['start'] is None:
+                continue
+            if start is not None and datetime.datetime.strptime(entry['end'], _TIME_FORMAT) < start:
+                continue
+            if end is not None and datetime.datetime.strptime(entry['start'], _TIME_FORMAT) > end:
+                continue
+            if human_ids is not None and not any(entry['human_min'] <= x <= entry['human_max'] for x in human_ids):
+                continue
+            if event_types is not None and not set(event_types) & set(entry['event_types']):
+                continue
+            entries.append(entry)
+        return sorted(entries, key=lambda entry: (entry['start'], entry['end']))
+
+    def read(self, entry):
+        """ Chunk of `entry`, as it was appended; uncompressed columns are read-only views of the mapped archive """
+        if entry['format'] == ARRAYS:
+            if self._map is None:
+                self._map = np.memmap(self.path, mode='r')
+            return {
+                name: np.frombuffer(self._map, dtype=np.dtype(column['dtype']), count=int(np.prod(column['shape'])),
+                                    offset=entry['offset'] + column['offset']).reshape(column['shape'])
+                for name, column in entry['columns'].items()
+            }
+
+        with open(self.path, 'rb') as f:
+            f.seek(entry['offset'])
+            payload = f.read(entry['length'])
+        if entry['format'] == COLUMNS:
+            return loads_columns(payload)
+        return pickle.loads(payload)
+
+    @property
+    def courses(self):
+        """ `DiseaseCourses` of the archive, if any """
+        if self._courses is None:
+            entries = [entry for entry in self.index if entry['format'] == COURSES]
+            self._courses = self.read(entries[-1]) if entries else None
+        return self._courses
+
+    def events(self, start=None, end=None, human_ids=None, event_types=None):
+        """ Yields the events between `start` and `end`, of `human_ids` and of `event_types`, reading the matching chunks only """
+        names = None if human_ids is None else {f"human:{x}" if isinstance(x, int) else x for x in human_ids}
+        for entry in self.select(start, end, human_ids, event_types):
+            chunk = self.read(entry)
+            if entry['format'] in [COLUMNS, ARRAYS]:
+                chunk = iter_encounter_events(chunk, self.courses)
+            for event in chunk:
+                if ((start is None or event['time'] >= start) and (end is None or event['time'] <= end)
+                        and (names is None or event['human_id'] in names)
+                        and (event_types is None or event['event_type'] in event_types)):
+                    yield event
+
+    def columns(self, start=None, end=None, human_ids=None):
+        """ Yields the encounter columns of the chunks that can hold encounters between `start` and `end` or of `human_ids` """
+        for entry in self.select(start, end, human_ids, event_types=['encounter']):
+            if entry['format'] in [COLUMNS, ARRAYS]:
+                yield self.read(entry)
+
+
+def sort_archive(path, dest, chunk_size=25000):
+    """
+    Rewrites the events of the archive at `path` to `dest` in chunks sorted by human and time, so that the
+    chunks of a human span a short range of ids. Encounter columns, which hold two humans per row, and the
+    disease courses are copied as they are.
+    """
+    reader = ArchiveReader(path)
+    events = []
+    for entry in reader.index:
+        chunk = reader.read(entry)
+        if entry['format'] == EVENTS:
+            events.extend(chunk)
+        else:
+            append_chunk(dest, chunk, uncompressed=entry['format'] == ARRAYS)
+
+    events.sort(key=lambda event: (_human_id(event['human_id']), event['time']))
+    for i in range(0, len(events), chunk_size):
+        append_chunk(dest, events[i:i + chunk_size])
@@ -3,14 +3,65 @@ import math
 import copy
 import datetime
 import itertools
+import collections
 import numpy as np
 from collections import defaultdict
+from scipy.spatial import cKDTree
 from orderedset import OrderedSet
 import copy
 
 from config import *
-from utils import compute_distance, _get_random_area
+from utils import compute_distances, compute_preferences, _get_random_area
 from track import Tracker
+from encounters import EncounterLog
+from population import Population
+from samplers import CDFSampler, categorical, sample_distinct
+
+class EventBus(object):
+    """
+    Append-only store of the simulation events, cut in chunks of `chunk_size` events.
+    Full chunks are handed as they are (without copy) to the writer.
+    """
+
+    def __init__(self, chunk_size=None):
+        self.chunk_size = chunk_size
+        self.current = []
+        self._chunks = collections.deque()
+        self._n_chunked = 0
+
+    def __len__(self):
+        return self._n_chunked + len(self.current)
+
+    def append(self, event):
+        current = self.current
+        current.append(event)
+        if self.chunk_size and len(current) >= self.chunk_size:
+            self._chunks.append(current)
+            self._n_chunked += len(current)
+            self.current = []
+
+    @property
+    def n_chunks(self):
+        return len(self._chunks)
+
+    @property
+    def pending(self):
+        return list(itertools.chain(*self._chunks, self.current))
+
+    def pop_chunk(self):
+        """ Detaches and returns the oldest full chunk """
+        chunk = self._chunks.popleft()
+        self._n_chunked -= len(chunk)
+        return chunk
+
+    def pull(self):
+        """ Detaches and returns all the pending events """
+        events = list(itertools.chain(*self._chunks, self.current))
+        self._chunks.clear()
+        self._n_chunked = 0
+        self.current = []
+        return events
+
 
 class Env(simpy.Environment):
 
@@ -18,22 +69,43 @@ class Env(simpy.Environment):
         super().__init__()
         self.initial_timestamp = initial_timestamp
 
+        # clock values cached for the current tick
+        self._clock_tick = None
+        self._timestamp = None
+        self._hour_of_day = None
+        self._day_of_week = None
+
+        # every event of the simulation is appended here by the humans
+        self.event_bus = EventBus()
+        self.encounter_log = EncounterLog(deferred=DEFERRED_ENCOUNTER_PAYLOAD, initial_timestamp=initial_timestamp)
+
     def time(self):
         return self.now
 
+    def _update_clock(self):
+        self._clock_tick = self._now
+        self._timestamp = self.initial_timestamp + datetime.timedelta(minutes=self._now * TICK_MINUTE)
+        self._hour_of_day = self._timestamp.hour
+        self._day_of_week = self._timestamp.weekday()
+
     @property
     def timestamp(self):
-        return self.initial_timestamp + datetime.timedelta(
-            minutes=self.now * TICK_MINUTE)
+        if self._clock_tick != self._now:
+            self._update_clock()
+        return self._timestamp
 
     def minutes(self):
         return self.timestamp.minute
 
     def hour_of_day(self):
-        return self.timestamp.hour
+        if self._clock_tick != self._now:
+            self._update_clock()
+        return self._hour_of_day
 
     def day_of_week(self):
-        return self.timestamp.weekday()
+        if self._clock_tick != self._now:
+            self._update_clock()
+        return self._day_of_week
 
     def is_weekend(self):
         return self.day_of_week() in [0, 6]
@@ -41,6 +113,10 @@ class Env(simpy.Environment):
     def time_of_day(self):
         return self.timestamp.isoformat()
 
+    def tick(self, timestamp):
+        """ Converts a timestamp into the (fractional) tick at which it happens """
+        return (timestamp - self.initial_timestamp) / datetime.timedelta(minutes=TICK_MINUTE)
+
 
 class City(object):
 
@@ -56,8 +132,12 @@ class City(object):
         self.sim_days=sim_days
         print("Initializing locations ...")
         self.initialize_locations()
+        self.misc_index = {m: i for i, m in enumerate(self.miscs)}
+        self.hospital_index = HospitalIndex(self.hospitals)
+        self.misc_samplers = collections.OrderedDict()
 
         self.humans = []
+        self.population = Population(sum(math.ceil(specs['p'] * self.n_people) for specs in HUMAN_DISTRIBUTION.values()), self.sim_days)
         self.households = OrderedSet()
         print("Initializing humans ...")
         self.initialize_humans(Human)
@@ -66,6 +146,12 @@ class City(object):
         self._compute_preferences()
         self.tracker = Tracker(env, self)
 
+    def __getstate__(self):
+        # the tracker is rebuilt when a cached city is loaded (see city_cache)
+        state = dict(self.__dict__)
+        del state['tracker']
+        return state
+
     def create_location(self, specs, type, name, area=None):
         _cls = Location
         if type in ['household', 'senior_residency']:
@@ -105,9 +191,51 @@ class City(object):
         # current implementation is an approximate heuristic
 
         # make humans
+        if BATCHED_POPULATION_SYNTHESIS:
+            self.make_humans_batched(Human)
+        else:
+            self.make_humans(Human)
+
+        # assign houses
+        # each human goes to the first house, in order of creation, that has a vacancy and keeps
+        # the average age of its residents above MIN_AVG_HOUSE_AGE
+        remaining_houses = VacantHouses(len(self.humans) + 1)
+        for human in self.humans:
+            if human.household is not None:
+                continue
+            if len(remaining_houses) == 0:
+                cap = categorical((1, 2, 3, 4, 5), tuple(HOUSE_SIZE_PREFERENCE)).sample(self.rng, size=1)
+                x = self.create_location(LOCATION_DISTRIBUTION['household'], 'household', len(self.households))
+
+                remaining_houses.add(x, cap.item())
+
+            # get_best_match
+            res = remaining_houses.pop_match(human.age)
+
+            if res is None:
+                for i, (l,u) in enumerate(HUMAN_DISTRIBUTION.keys()):
+                    if l <= human.age < u:
+                        bin = (l,u)
+                        break
+
+                house_size_preference = HUMAN_DISTRIBUTION[(l,u)]['residence_preference']['house_size']
+                cap = categorical((1, 2, 3, 4, 5), tuple(house_size_preference)).sample(self.rng, size=1)
+                res = self.create_location(LOCATION_DISTRIBUTION['household'], 'household', len(self.households))
+                if cap - 1 > 0:
+                    remaining_houses.add(res, cap.item() - 1, age_sum=human.age, n_residents=1)
+
+            # FIXME: there is some circular reference here
+            res.residents.append(human)
+            human.assign_household(res)
+            self.households.add(res)
+
+        # assign area to house
+        area = _get_random_area(len(self.households), LOCATION_DISTRIBUTION['household']['area'] * self.total_area, self.rng)
+        for i,house in enumerate(self.households):
+            house.area = area[i]
+
+    def make_humans(self, Human):
         count_humans = 0
-        house_allocations = {2:[], 3:[], 4:[], 5:[]}
-        n_houses = 0
         for age_bin, specs in HUMAN_DISTRIBUTION.items():
             n = math.ceil(specs['p'] * self.n_people)
             ages = self.rng.randint(*age_bin, size=n)
@@ -148,67 +276,186 @@ class City(object):
                         rho=0.1,
                         gamma=0.21,
                         infection_timestamp=self.start_time if self.rng.random() < self.init_percent_sick else None,
-                        sim_days=self.sim_days
+                        sim_days=self.sim_days,
+                        population=self.population,
+                        idx=count_humans - 1
                         )
                     )
 
-        # assign houses
-        # stores tuples - (location, current number of residents, maximum number of residents allowed)
-        remaining_houses = []
-        for human in self.humans:
-            if human.household is not None:
-                continue
-            if len(remaining_houses) == 0:
-                cap = self.rng.choice(range(1,6), p=HOUSE_SIZE_PREFERENCE, size=1)
-                x = self.create_location(LOCATION_DISTRIBUTION['household'], 'household', len(self.households))
-
-                remaining_houses.append((x, cap))
-
-            # get_best_match
-            res = None
-            for  c, (house, n_vacancy) in enumerate(remaining_houses):
-                new_avg_age = (human.age + sum(x.age for x in house.residents))/(len(house.residents) + 1)
-                if new_avg_age > MIN_AVG_HOUSE_AGE:
-                    res = house
-                    n_vacancy -= 1
-                    if n_vacancy == 0:
-                        remaining_houses = remaining_houses[:c] + remaining_houses[c+1:]
-                    break
-
-            if res is None:
-                for i, (l,u) in enumerate(HUMAN_DISTRIBUTION.keys()):
-                    if l <= human.age < u:
-                        bin = (l,u)
-                        break
-
-                house_size_preference = HUMAN_DISTRIBUTION[(l,u)]['residence_preference']['house_size']
-                cap = self.rng.choice(range(1,6), p=house_size_preference, size=1)
-                res = self.create_location(LOCATION_DISTRIBUTION['household'], 'household', len(self.households))
-                if cap - 1 > 0:
-                    remaining_houses.append((res, cap-1))
-
-            # FIXME: there is some circular reference here
-            res.residents.append(human)
-            human.assign_household(res)
-            self.households.add(res)
-
-        # assign area to house
-        area = _get_random_area(len(self.households), LOCATION_DISTRIBUTION['household']['area'] * self.total_area, self.rng)
-        for i,house in enumerate(self.households):
-            house.area = area[i]
+    def make_humans_batched(self, Human):
+        """ make_humans with the draws of all humans done at once (BATCHED_POPULATION_SYNTHESIS) """
+        professions = ['healthcare', 'school', 'others', 'retired']
+        ages, profession, res, workplace = [], [], [], []
+        for age_bin, specs in HUMAN_DISTRIBUTION.items():
+            n = math.ceil(specs['p'] * self.n_people)
+            ages.append(self.rng.randint(*age_bin, size=n))
+            p = [specs['profession_profile'][x] for x in professions]
+            profession.append(self.rng.choice(professions, p=p, size=n))
+
+            # residence
+            senior = self.rng.random_sample(n) < specs['residence_preference']['senior_residency']
+            residences = self.rng.randint(len(self.senior_residencys), size=n)
+            res.extend(self.senior_residencys[j] if s else None for s, j in zip(senior, residences))
+
+            # workplace
+            for candidates in [self.hospitals + self.senior_residencys, self.schools, self.workplaces]:
+                workplace.append(self.rng.randint(len(candidates), size=n))
+
+        ages, profession = np.concatenate(ages), np.concatenate(profession)
+        workplaces = [np.concatenate(workplace[k::3]) for k in range(3)]
+        infected = self.rng.random_sample(len(ages)) < self.init_percent_sick
+        traits = self.population.synthesize(ages, self.rng)
+
+        for k, candidates in enumerate([self.hospitals + self.senior_residencys, self.schools, self.workplaces]):
+            workplaces[k] = [candidates[j] for j in workplaces[k]]
+        for i in range(len(ages)):
+            if profession[i] == "healthcare":
+                w = workplaces[0][i]
+            elif profession[i] == 'school':
+                w = workplaces[1][i]
+            elif profession[i] == 'others':
+                w = workplaces[2][i]
+            else:
+                w = res[i]
+
+            self.humans.append(Human(
+                    env=self.env,
+                    rng=self.rng,
+                    name=i + 1,
+                    age=ages[i],
+                    household=res[i],
+                    workplace=w,
+                    profession=profession[i],
+                    rho=0.1,
+                    gamma=0.21,
+                    infection_timestamp=self.start_time if infected[i] else None,
+                    sim_days=self.sim_days,
+                    population=self.population,
+                    idx=i,
+                    traits=traits[i]
+                    )
+                )
 
     @property
     def events(self):
-        return list(itertools.chain(*[h.events for h in self.humans]))
+        return self.env.event_bus.pending
 
     def pull_events(self):
-        return list(itertools.chain(*[h.pull_events() for h in self.humans]))
+        return self.env.event_bus.pull()
+
+    def misc_sampler(self, location):
+        """ Sampler of the miscs in proportion to their preference (inverse distance) from `location`, which is excluded """
+        sampler = self.misc_samplers.get(location)
+        if sampler is None:
+            weights = (compute_distances([location], self.miscs)[0] + 1e-1) ** -1
+            weights[[m == location for m in self.miscs]] = 0
+            sampler = self.misc_samplers[location] = CDFSampler(weights)
+            # one sampler per origin would hold O(#households x #miscs) weights
+            if len(self.misc_samplers) > MISC_SAMPLERS_CACHE_SIZE:
+                self.misc_samplers.popitem(last=False)
+        else:
+            self.misc_samplers.move_to_end(location)
+        return sampler
 
     def _compute_preferences(self):
         """ compute preferred distribution of each human for park, stores, etc."""
-        for h in self.humans:
-            h.stores_preferences = [(compute_distance(h.household, s) + 1e-1) ** -1 for s in self.stores]
-            h.parks_preferences = [(compute_distance(h.household, s) + 1e-1) ** -1 for s in self.parks]
+        # computed once per household, then shared by its residents
+        households = {}
+        rows = np.array([households.setdefault(h.household, len(households)) for h in self.humans])
+        households = list(households)
+
+        for name, locs in [('stores', self.stores), ('parks', self.parks)]:
+            preferred, preferences = compute_preferences(households, locs, k=PREFERENCES_TOP_K)
+            setattr(self.population, f"{name}_preferences", preferences[rows])
+            setattr(self.population, f"{name}_preferred", None if preferred is None else preferred[rows])
+
+
+class VacantHouses(object):
+    """
+    Houses with vacancies, in order of creation, indexed by a max segment tree over
+    `age_sum - MIN_AVG_HOUSE_AGE * n_residents` so that the first house a human of a given
+    age can join is found in O(log n) instead of scanning the houses and summing their residents' ages.
+    """
+
+    def __init__(self, max_houses):
+        self.size = 1 << max(max_houses - 1, 1).bit_length()
+        self.tree = [-math.inf] * (2 * self.size)
+        self.houses, self.vacancies, self.age_sums, self.n_residents = [], [], [], []
+        self.n_vacant = 0
+
+    def __len__(self):
+        return self.n_vacant
+
+    def _update(self, i):
+        key = self.age_sums[i] - MIN_AVG_HOUSE_AGE * self.n_residents[i] if self.vacancies[i] > 0 else -math.inf
+        i += self.size
+        self.tree[i] = key
+        i >>= 1
+        while i:
+            self.tree[i] = max(self.tree[2 * i], self.tree[2 * i + 1])
+            i >>= 1
+
+    def add(self, house, n_vacancy, age_sum=0, n_residents=0):
+        self.houses.append(house)
+        self.vacancies.append(n_vacancy)
+        self.age_sums.append(age_sum)
+        self.n_residents.append(n_residents)
+        self.n_vacant += n_vacancy > 0
+        self._update(len(self.houses) - 1)
+
+    def pop_match(self, age):
+        """ Takes a spot in the first house where the average age stays above MIN_AVG_HOUSE_AGE """
+        # (age_sum + age) / (n_residents + 1) > MIN_AVG_HOUSE_AGE
+        threshold = MIN_AVG_HOUSE_AGE - age
+        tree = self.tree
+        if tree[1] <= threshold:
+            return None
+        i = 1
+        while i < self.size:
+            i = 2 * i if tree[2 * i] > threshold else 2 * i + 1
+        i -= self.size
+
+        self.age_sums[i] += age
+        self.n_residents[i] += 1
+        self.vacancies[i] -= 1
+        if self.vacancies[i] == 0:
+            self.n_vacant -= 1
+        self._update(i)
+        return self.houses[i]
+
+
+class HospitalIndex(object):
+    """
+    k-d tree over the hospitals, to find the nearest one with a free bed without sorting all of them.
+    Hospitals at the same distance are taken in the order of `hospitals`.
+    """
+
+    def __init__(self, hospitals):
+        self.hospitals = hospitals
+        self.tree = cKDTree(np.array([[h.lat, h.lon] for h in hospitals], dtype=np.float64))
+
+    def nearest(self, location, icu=False, has_bed=None):
+        """
+        Nearest hospital (or ICU) to `location` with a free bed, None if they are all full.
+        `has_bed` overrides the check of the free beds of a hospital (or ICU).
+        """
+        n = len(self.hospitals)
+        k = 1
+        while True:
+            k = min(k, n)
+            distances, idx = self.tree.query([location.lat, location.lon], k=k)
+            distances, idx = np.atleast_1d(distances), np.atleast_1d(idx)
+            for j in np.lexsort((idx, distances)):
+                # hospitals at the k-th distance may tie with some not queried yet
+                if k < n and distances[j] == distances[-1]:
+                    break
+                hospital = self.hospitals[idx[j]]
+                hospital = hospital.icu if icu else hospital
+                if (hospital.free_beds > 0 if has_bed is None else has_bed(hospital)):
+                    return hospital
+            if k == n:
+                return None
+            k *= 2
 
 
 class Location(simpy.Resource):
@@ -221,6 +468,10 @@ class Location(simpy.Resource):
 
         super().__init__(env, capacity)
         self.humans = OrderedSet() #OrderedSet instead of set for determinism when iterating
+        self.arrival_ticks = {} # tick at which each occupant arrived
+        # occupants that can take part in a transmission (see INFECTION_ONLY_ENCOUNTERS)
+        self.infected_humans = OrderedSet()
+        self.susceptible_humans = OrderedSet()
         self.name = name
         self.rng = rng
         self.lat = lat
@@ -228,6 +479,7 @@ class Location(simpy.Resource):
         self.area = area
         self.location_type = location_type
         self.social_contact_factor = social_contact_factor
+        self.max_contacts = max(1, round(MAX_CONTACTS_PER_VISIT * social_contact_factor)) # see CONTACT_SAMPLING
         self.env = env
         self.contamination_timestamp = datetime.datetime.min
         self.contaminated_surface_probability = surface_prob
@@ -241,13 +493,94 @@ class Location(simpy.Resource):
 
     def add_human(self, human):
         self.humans.add(human)
+        self.arrival_ticks[human] = self.env.now
+        self.update_human_status(human)
         if human.is_infectious:
-            self.contamination_timestamp = self.env.timestamp
-            rnd_surface = float(self.rng.choice(a=MAX_DAYS_CONTAMINATION, size=1, p=self.contaminated_surface_probability))
-            self.max_day_contamination = max(self.max_day_contamination, rnd_surface)
+            self.contaminate()
+
+    def contaminate(self, n=1):
+        """ Surfaces contaminated now by `n` arrivals of infectious humans """
+        self.contamination_timestamp = self.env.timestamp
+        rnd_surface = float(categorical(tuple(MAX_DAYS_CONTAMINATION), tuple(self.contaminated_surface_probability)).sample(self.rng, size=n).max())
+        self.max_day_contamination = max(self.max_day_contamination, rnd_surface)
+
+    def encounter_distances(self, n, rng):
+        """ Draws the distances (cms) between an occupant and `n` others, independently for each pair """
+        return np.sqrt(int(self.area / len(self.humans))) + rng.randint(MIN_DIST_ENCOUNTER, MAX_DIST_ENCOUNTER, size=n)
+
+    def _close_offsets(self):
+        """
+        Base distance of a pair (cms) and number of integer offsets in [MIN_DIST_ENCOUNTER, MAX_DIST_ENCOUNTER)
+        that keep it within INFECTION_RADIUS (see `encounter_distances`)
+        """
+        base = np.sqrt(int(self.area / len(self.humans)))
+        n_close = min(max(math.floor(INFECTION_RADIUS - base) - MIN_DIST_ENCOUNTER + 1, 0), MAX_DIST_ENCOUNTER - MIN_DIST_ENCOUNTER)
+        return base, n_close
+
+    def n_contacts(self, t_overlap, rng):
+        """
+        Draws how many of the pairs of an occupant with the others, together for `t_overlap` minutes each,
+        are contacts: within INFECTION_RADIUS (as drawn by `encounter_distances`) for longer than
+        INFECTION_DURATION (as drawn by `Human._resolve_encounters`).
+        """
+        _, n_close = self._close_offsets()
+        p_close = n_close / (MAX_DIST_ENCOUNTER - MIN_DIST_ENCOUNTER)
+        p_long = 1 - INFECTION_DURATION / np.maximum(t_overlap, INFECTION_DURATION)
+        return int(rng.binomial(len(t_overlap), p_close * p_long.mean()))
+
+    def hourly_contacts(self, t_overlap, rng):
+        """
+        Draws the contacts of an occupant with the others it spends `t_overlap` minutes with, as if they met
+        again every hour like the residents of the hourly loop: each hour together, and the last partial one,
+        is a contact with the probability of `n_contacts`. Returns the distance and duration (minutes) of one
+        contact of each pair, and the number of contacts of each pair.
+        """
+        base, n_close = self._close_offsets()
+        p_close = n_close / (MAX_DIST_ENCOUNTER - MIN_DIST_ENCOUNTER)
+        t_overlap = np.maximum(t_overlap, 0)
+        hours = np.floor(t_overlap / 60)
+        rest = t_overlap - 60 * hours
+        n_contacts = rng.binomial(hours.astype(int), p_close * (1 - INFECTION_DURATION / 60))
+        n_contacts += rng.random_sample(len(t_overlap)) < p_close * (1 - INFECTION_DURATION / np.maximum(rest, INFECTION_DURATION))
+        distance = base + rng.randint(MIN_DIST_ENCOUNTER, MIN_DIST_ENCOUNTER + max(n_close, 1), size=len(t_overlap))
+        t_near = rng.uniform(INFECTION_DURATION, 60, size=len(t_overlap))
+        return distance, t_near, n_contacts
+
+    def sample_contacts(self, others, rng):
+        """
+        Contact model for crowded locations (CONTACT_SAMPLING). Instead of drawing a distance to each
+        of the `others`, it draws how many of them come within INFECTION_RADIUS (binomial with the
+        per-pair probability of `encounter_distances`), bounded by `max_contacts`, picks that many
+        at random and draws their distances given that they are within the radius.
+        Returns the sampled occupants, in occupancy order, and their distances.
+        """
+        base, n_close = self._close_offsets()
+        k = min(rng.binomial(len(others), n_close / (MAX_DIST_ENCOUNTER - MIN_DIST_ENCOUNTER)), self.max_contacts)
+        if k == 0:
+            return [], np.zeros(0)
+
+        idx = sample_distinct(rng, len(others), k)
+        distance = base + rng.randint(MIN_DIST_ENCOUNTER, MIN_DIST_ENCOUNTER + n_close, size=k)
+        return [others[i] for i in idx], distance
 
     def remove_human(self, human):
         self.humans.remove(human)
+        self.arrival_ticks.pop(human, None)
+        self.infected_humans.discard(human)
+        self.susceptible_humans.discard(human)
+
+    def update_human_status(self, human):
+        """ Files an occupant under the infected or susceptible index after a change of its disease state """
+        self.infected_humans.discard(human)
+        self.susceptible_humans.discard(human)
+        if human.infection_tick is not None:
+            self.infected_humans.add(human)
+        elif human.is_susceptible:
+            self.susceptible_humans.add(human)
+
+    @property
+    def infectious_humans(self):
+        return [h for h in self.infected_humans if h.is_infectious]
 
     @property
     def is_contaminated(self):
@@ -280,6 +613,12 @@ class Location(simpy.Resource):
             del s['residents']
         if s.get('humans'):
             del s['humans']
+        if s.get('arrival_ticks') is not None:
+            del s['arrival_ticks']
+        if s.get('infected_humans') is not None:
+            del s['infected_humans']
+        if s.get('susceptible_humans') is not None:
+            del s['susceptible_humans']
         return s
 
 class Household(Location):
@@ -314,6 +653,7 @@ class Hospital(Location):
                                         surface_prob=surface_prob,
                                         )
         self.location_contamination = 1
+        self.free_beds = self.capacity
         self.icu = ICU( env=env,
                         rng=rng,
                         area=area * (self.ICU_AREA),
@@ -328,10 +668,14 @@ class Hospital(Location):
 
     def add_human(self, human):
         human.obs_hospitalized = True
+        if human not in self.humans:
+            self.free_beds -= 1
         super().add_human(human)
 
     def remove_human(self, human):
         human.obs_hospitalized = False
+        if human in self.humans:
+            self.free_beds += 1
         super().remove_human(human)
 
 
@@ -339,15 +683,20 @@ class ICU(Location):
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
+        self.free_beds = self.capacity
 
     def add_human(self, human):
         human.obs_hospitalized = True
         human.obs_in_icu = True
+        if human not in self.humans:
+            self.free_beds -= 1
         super().add_human(human)
 
     def remove_human(self, human):
         human.obs_hospitalized = False
         human.obs_in_icu = False
+        if human in self.humans:
+            self.free_beds += 1
         super().remove_human(human)
 
 
@@ -364,6 +713,10 @@ class Event:
 
     @staticmethod
     def log_encounter(human1, human2, location, duration, distance, infectee, time):
+        if COLUMNAR_ENCOUNTERS:
+            human1.env.encounter_log.append(human1, human2, location, duration, distance, infectee, time)
+            return
+
         h_obs_keys   = ['obs_age', 'has_app', 'obs_preexisting_conditions',
                         'obs_symptoms',
                         'obs_hospitalized', 'obs_in_icu', 'wearing_mask',
@@ -0,0 +1,71 @@
+import hashlib
+import os
+import pickle
+
+import config
+from base import City, Env
+from track import Tracker
+
+# config.py parameters read while synthesizing a city; changing any of them invalidates the cached cities
+CITY_PARAMETERS = [
+    'HUMAN_DISTRIBUTION', 'LOCATION_DISTRIBUTION', 'HOUSE_SIZE_PREFERENCE', 'MIN_AVG_HOUSE_AGE',
+    'BATCHED_POPULATION_SYNTHESIS', 'LAZY_DISEASE_COURSE', 'MAX_CONTACTS_PER_VISIT', 'PREFERENCES_TOP_K',
+    'P_CAREFUL_PERSON', 'BASELINE_P_MASK', 'P_COLD', 'P_FLU', 'P_HAS_APP', 'P_NEVER_RECOVERS',
+    'BASELINE_P_ASYMPTOMATIC', 'ASYMPTOMATIC_INFECTION_RATIO',
+    'AVG_INCUBATION_DAYS', 'SCALE_INCUBATION_DAYS', 'AVG_RECOVERY_DAYS', 'SCALE_RECOVERY_DAYS',
+    'MIN_VIRAL_LOAD', 'MAX_VIRAL_LOAD', 'PLATEAU_START_CLIP_LOW', 'PLATEAU_START_CLIP_HIGH', 'PLATEAU_START_MEAN',
+    'PLATEAU_START_STD', 'PLATEAU_DURATION_CLIP_LOW', 'PLATEAU_DURATION_CLIP_HIGH', 'PLATEAU_DURATION_MEAN',
+    'PLEATEAU_DURATION_STD', 'RECOVERY_CLIP_HIGH', 'RECOVERY_MEAN', 'RECOVERY_STD',
+    'AVG_SHOP_TIME_MINUTES', 'SCALE_SHOP_TIME_MINUTES', 'AVG_SCALE_SHOP_TIME_MINUTES', 'SCALE_SCALE_SHOP_TIME_MINUTES',
+    'AVG_EXERCISE_MINUTES', 'SCALE_EXERCISE_MINUTES', 'AVG_SCALE_EXERCISE_MINUTES', 'SCALE_SCALE_EXERCISE_MINUTES',
+    'AVG_WORKING_MINUTES', 'SCALE_WORKING_MINUTES', 'AVG_SCALE_WORKING_MINUTES', 'SCALE_SCALE_WORKING_MINUTES',
+    'AVG_HOSPITAL_HOURS', 'SCALE_HOSPITAL_HOURS', 'AVG_SCALE_HOSPITAL_HOURS', 'SCALE_SCALE_HOSPITAL_HOURS',
+    'AVG_MISC_MINUTES', 'SCALE_MISC_MINUTES', 'AVG_SCALE_MISC_MINUTES', 'SCALE_SCALE_MISC_MINUTES',
+    'AVG_NUM_SHOPPING_DAYS', 'SCALE_NUM_SHOPPING_DAYS', 'AVG_NUM_SHOPPING_HOURS', 'SCALE_NUM_SHOPPING_HOURS',
+    'AVG_NUM_EXERCISE_DAYS', 'SCALE_NUM_EXERCISE_DAYS', 'AVG_NUM_EXERCISE_HOURS', 'SCALE_NUM_EXERCISE_HOURS',
+    'AVG_MAX_NUM_SHOP_PER_WEEK', 'SCALE_MAX_NUM_SHOP_PER_WEEK',
+    'AVG_MAX_NUM_EXERCISE_PER_WEEK', 'SCALE_MAX_NUM_EXERCISE_PER_WEEK',
+    # baked into the disease course of the initially sick humans, and into the encounter log of the environment
+    'TICK_MINUTE', 'INFECTIOUSNESS_ONSET_DAYS', 'DEFERRED_ENCOUNTER_PAYLOAD',
+]
+
+
+def city_key(n_people, rng, x_range, y_range, start_time, init_percent_sick, Human, sim_days):
+    """ Hash of everything that determines the synthesized city, including the state of `rng` before the build """
+    h = hashlib.sha1()
+    h.update(repr((n_people, x_range, y_range, start_time, init_percent_sick, f"{Human.__module__}.{Human.__qualname__}", sim_days)).encode())
+    h.update(repr([(name, getattr(config, name)) for name in CITY_PARAMETERS]).encode())
+    name, keys, pos, has_gauss, cached_gaussian = rng.get_state()
+    h.update(keys.tobytes())
+    h.update(repr((name, pos, has_gauss, cached_gaussian)).encode())
+    return h.hexdigest()
+
+
+def load_or_build_city(start_time, n_people, rng, x_range, y_range, init_percent_sick, Human, sim_days, cache_dir=None):
+    """
+    Returns the environment and the city of a run. With a `cache_dir`, the city is read from its cached copy if one
+    exists, and otherwise built and written there. A city read from the cache, along with its environment and the
+    state of its random generator, is the same as a freshly built one.
+    """
+    cache_dir = cache_dir or config.CITY_CACHE_DIR
+    if cache_dir is None:
+        env = Env(start_time)
+        return env, City(env, n_people, rng, x_range, y_range, start_time, init_percent_sick, Human, sim_days)
+
+    path = os.path.join(cache_dir, f"city-{city_key(n_people, rng, x_range, y_range, start_time, init_percent_sick, Human, sim_days)}.pkl")
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            env, city = pickle.load(f)
+        city.tracker = Tracker(env, city)
+        # continue with the random stream of the cached city
+        rng.set_state(city.rng.get_state())
+        return env, city
+
+    env = Env(start_time)
+    city = City(env, n_people, rng, x_range, y_range, start_time, init_percent_sick, Human, sim_days)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        pickle.dump((env, city), f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+    return env, city
@@ -188,9 +188,27 @@ BASELINE_P_MASK = 0.5
 
 # SIMULATION PARAMETERS
 TICK_MINUTE = 2  # @param increment
+TICKS_PER_DAY = 24 * 60 / TICK_MINUTE
 SIMULATION_DAYS = 30  # @param
 SYMPTOM_DAYS = 5  # @param
 COLLECT_LOGS = False
+COLUMNAR_ENCOUNTERS = False  # log the encounters as rows of typed column chunks (see encounters.py) instead of nested dicts
+DEFERRED_ENCOUNTER_PAYLOAD = False  # with COLUMNAR_ENCOUNTERS, log only the facts of the encounters and recompute the other fields when reading
+UNCOMPRESSED_COLUMNS = False  # write the encounter columns as raw arrays, which readers memory-map (see archive.py)
+EVENT_DRIVEN_SCHEDULER = False  # sleep at home until the next possible activity instead of waking up every hour
+MAX_SLEEP_HOURS = 24  # longest uninterrupted stay at home with EVENT_DRIVEN_SCHEDULER
+P_LEISURE_PER_WEEKEND_HOUR = 0.05
+INFECTION_ONLY_ENCOUNTERS = False  # with COLLECT_LOGS False, only resolve pairs that can transmit and keep aggregate contact counts
+COALESCE_HOME_STAYS = False  # consecutive hours at home form a single household stay
+CONTACT_SAMPLING = False  # sample a bounded number of contacts per visit in crowded location types
+CONTACT_SAMPLING_LOCATION_TYPES = ['school', 'hospital', 'hospital-icu', 'senior_residency', 'workplace']
+MAX_CONTACTS_PER_VISIT = 25  # scaled by the social_contact_factor of the location
+DEPARTURE_TIME_ENCOUNTERS = False  # resolve each pair once, when the earlier of the two leaves, with their exact overlap
+BATCHED_POPULATION_SYNTHESIS = False  # draw the traits of all humans at once (same distributions, different random stream)
+LAZY_DISEASE_COURSE = False  # draw the viral load and symptoms of a human when it gets infected, from its own random stream
+PREFERENCES_TOP_K = None  # keep the preferences of each human for its k nearest stores and parks only; None keeps them all
+MISC_SAMPLERS_CACHE_SIZE = 1024  # number of origins whose misc sampler is kept, least recently used first out
+CITY_CACHE_DIR = None  # directory where synthesized cities are cached between runs; None builds the city on every run
 
 # LIFESTYLE PARAMETERS
 ## SHOP
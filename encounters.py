@@ -0,0 +1,399 @@
+"""
+Columnar log of the encounter events (COLUMNAR_ENCOUNTERS).
+
+Each encounter is a single row of typed columns, holding the facts of the encounter and the fields of both
+humans, instead of two nested dicts. Rows are buffered and cut in chunks of NumPy arrays, which
+`EventMonitor` appends to the event archive as column records (compressed with `dumps_columns`, or raw
+arrays with UNCOMPRESSED_COLUMNS, see archive.py) that `ArchiveReader.columns` reads back.
+`iter_encounter_events` yields the dicts `Event.log_encounter` builds from such a chunk.
+
+With DEFERRED_ENCOUNTER_PAYLOAD, a row only holds the facts of the encounter (ids, tick, location, duration,
+distance, infectee) and the state of the humans and of the location kept in plain attributes. The other
+fields are recomputed when the chunk is read, by the properties of `Human` and `Location`, from the
+`DiseaseCourses` of the humans written at the end of the run.
+"""
+import collections
+import datetime
+import io
+import types
+
+import numpy as np
+
+from config import INFECTIOUSNESS_ONSET_DAYS, LOCATION_TECH, TICK_MINUTE, TICKS_PER_DAY
+
+NULL_INT = np.iinfo(np.int32).min
+
+# fields of the humans, in the order of the payloads (and of the draws of `obs_lat` and `obs_lon`)
+H_OBS_FIELDS = [('obs_age', 'int'), ('has_app', 'bool'), ('obs_preexisting_conditions', 'list'),
+                ('obs_symptoms', 'list'), ('obs_hospitalized', 'bool'), ('obs_in_icu', 'bool'),
+                ('wearing_mask', 'bool'), ('obs_lat', 'int'), ('obs_lon', 'int'),
+                ('preexisting_conditions', 'list')]
+H_UNOBS_FIELDS = [('age', 'int'), ('carefulness', 'float'), ('viral_load', 'float'), ('infectiousness', 'float'),
+                  ('symptoms', 'list'), ('is_exposed', 'bool'), ('is_infectious', 'bool'),
+                  ('infection_timestamp', 'time'), ('really_sick', 'bool'), ('extremely_sick', 'bool'),
+                  ('sex', 'str')]
+
+ENCOUNTER_FIELDS = [('time', 'time'), ('location', 'str'), ('location_type', 'str'), ('lat', 'int'),
+                    ('lon', 'int'), ('contamination_probability', 'float'), ('social_contact_factor', 'float'),
+                    ('duration', 'float'), ('distance', 'float'), ('same_household', 'bool'),
+                    ('infectee', 'int'), ('infectiousness_start_time', 'time')]
+
+FIELDS = ENCOUNTER_FIELDS + [
+    (f"{prefix}_{key}", kind)
+    for prefix in ['human1', 'human2']
+    for key, kind in [('id', 'int'), ('location_is_residence', 'bool')] + H_OBS_FIELDS + H_UNOBS_FIELDS
+]
+
+# rows of DEFERRED_ENCOUNTER_PAYLOAD
+FACT_FIELDS = [('tick', 'float'), ('location', 'str'), ('contamination_timestamp', 'time'),
+               ('max_day_contamination', 'float'), ('duration', 'float'), ('distance', 'float'), ('infectee', 'int')] + [
+    (f"{prefix}_{key}", kind)
+    for prefix in ['human1', 'human2']
+    for key, kind in [('id', 'int'), ('infection_tick', 'float'), ('obs_hospitalized', 'bool'), ('obs_in_icu', 'bool')]
+]
+
+# attributes of the humans and locations that do not change during the simulation
+COURSE_FIELDS = ['age', 'sex', 'carefulness', 'has_app', 'obs_age', 'obs_preexisting_conditions', 'obs_symptoms',
+                 'preexisting_conditions', 'is_asymptomatic', 'gets_really_sick', 'gets_extremely_sick',
+                 'incubation_days', 'viral_load_plateau_height', 'viral_load_plateau_start', 'viral_load_plateau_end',
+                 'viral_load_recovered', 'all_symptoms']
+LOCATION_FIELDS = ['name', 'location_type', 'lat', 'lon', 'social_contact_factor']
+
+# properties evaluated on views of the humans and locations to read the deferred rows
+HUMAN_PROPERTIES = ['sickness_day', 'is_exposed', 'is_infectious', 'symptoms', 'really_sick', 'extremely_sick',
+                    'viral_load', 'infectiousness', 'wearing_mask']
+LOCATION_PROPERTIES = ['is_contaminated', 'contamination_probability']
+
+
+def _human_id(name):
+    return int(name.split(':')[1])
+
+
+class DiseaseCourses(object):
+    """
+    Attributes of the humans and locations of the deferred rows, which the rows do not repeat
+    """
+
+    def __init__(self, initial_timestamp, humans, locations):
+        self.initial_timestamp = initial_timestamp
+        self.humans = {
+            human_id: {
+                **{key: getattr(human, key) for key in COURSE_FIELDS},
+                'household': human.household.name,
+                'mask_wearing': np.array(human.mask_wearing),
+            }
+            for human, human_id in humans.items()
+        }
+        locations = {**{human.household.name: human.household for human in humans}, **locations}
+        self.locations = {name: {key: getattr(location, key) for key in LOCATION_FIELDS}
+                          for name, location in locations.items()}
+
+
+class EncounterLog(object):
+    """
+    Buffer of the encounter rows, cut in chunks of `chunk_size` rows like the `EventBus`
+    """
+
+    def __init__(self, chunk_size=None, deferred=False, initial_timestamp=None):
+        self.chunk_size = chunk_size
+        self.deferred = deferred
+        self.fields = FACT_FIELDS if deferred else FIELDS
+        self.initial_timestamp = initial_timestamp
+        self.strings = {}
+        # humans (with their id) and locations met in the deferred rows
+        self.humans = {}
+        self.locations = {}
+        self.n_chunked = 0
+        self._chunks = collections.deque()
+        self._new_rows()
+
+    def __len__(self):
+        return self.n_rows
+
+    @property
+    def n_chunks(self):
+        return len(self._chunks)
+
+    def _new_rows(self):
+        self.rows = {name: [] for name, _ in self.fields}
+        self.n_rows = 0
+
+    def _encode(self, value, kind):
+        if kind == 'str':
+            return self.strings.setdefault(value, len(self.strings))
+        if kind == 'list':
+            return None if value is None else [self.strings.setdefault(x, len(self.strings)) for x in value]
+        return value
+
+    def append(self, human1, human2, location, duration, distance, infectee, time):
+        if self.deferred:
+            self._append_facts(human1, human2, location, duration, distance, infectee)
+        else:
+            self._append_fields(human1, human2, location, duration, distance, infectee, time)
+
+        self.n_rows += 1
+        if self.chunk_size and self.n_rows >= self.chunk_size:
+            self._chunks.append(self._columns())
+            self._new_rows()
+
+    def _append_fields(self, human1, human2, location, duration, distance, infectee, time):
+        rows = self.rows
+        encode = self._encode
+
+        same_household = (human1.household.name == human2.household.name) & (location.name == human1.household.name)
+        for name, value in [('time', time), ('location', encode(location.name, 'str')),
+                            ('location_type', encode(location.location_type, 'str')),
+                            ('lat', location.lat), ('lon', location.lon),
+                            ('contamination_probability', location.contamination_probability),
+                            ('social_contact_factor', location.social_contact_factor),
+                            ('duration', duration), ('distance', distance), ('same_household', same_household)]:
+            rows[name].append(value)
+
+        exposed = None
+        for i, human in enumerate([human1, human2], 1):
+            prefix = f"human{i}_"
+            rows[prefix + 'id'].append(_human_id(human.name))
+            rows[prefix + 'location_is_residence'].append(human.household == location)
+            for key, kind in H_OBS_FIELDS + H_UNOBS_FIELDS:
+                rows[prefix + key].append(encode(getattr(human, key), kind))
+            if infectee == human.name:
+                exposed = i
+                start = human.infection_timestamp + datetime.timedelta(days=human.incubation_days - INFECTIOUSNESS_ONSET_DAYS)
+
+        rows['infectee'].append(exposed)
+        rows['infectiousness_start_time'].append(start if exposed else None)
+
+    def _append_facts(self, human1, human2, location, duration, distance, infectee):
+        rows = self.rows
+        if location.name not in self.locations:
+            self.locations[location.name] = location
+
+        rows['tick'].append(human1.env.now)
+        rows['location'].append(self.strings.setdefault(location.name, len(self.strings)))
+        rows['contamination_timestamp'].append(location.contamination_timestamp)
+        rows['max_day_contamination'].append(location.max_day_contamination)
+        rows['duration'].append(duration)
+        rows['distance'].append(distance)
+        rows['infectee'].append(1 if infectee == human1.name else 2 if infectee == human2.name else None)
+
+        for prefix, human in [('human1_', human1), ('human2_', human2)]:
+            human_id = self.humans.get(human)
+            if human_id is None:
+                human_id = self.humans[human] = _human_id(human.name)
+            rows[prefix + 'id'].append(human_id)
+            rows[prefix + 'infection_tick'].append(human.infection_tick)
+            rows[prefix + 'obs_hospitalized'].append(human.obs_hospitalized)
+            rows[prefix + 'obs_in_icu'].append(human.obs_in_icu)
+
+    def _columns(self):
+        """ Typed columns of the buffered rows """
+        columns = {}
+        for name, kind in self.fields:
+            values = self.rows[name]
+            if kind == 'list':
+                # ragged column: number of values of each row (-1 for None), and the values one after the other
+                columns[name] = np.array([-1 if x is None else len(x) for x in values], dtype=np.int16)
+                columns[f"{name}.values"] = np.array([c for x in values if x for c in x], dtype=np.int32)
+            elif kind == 'int':
+                columns[name] = np.array([NULL_INT if x is None else x for x in values], dtype=np.int32)
+            elif kind == 'bool':
+                columns[name] = np.array([-1 if x is None else x for x in values], dtype=np.int8)
+            elif kind == 'float':
+                columns[name] = np.array([np.nan if x is None else x for x in values], dtype=np.float64)
+            elif kind == 'time':
+                columns[name] = np.array(values, dtype='datetime64[us]')
+            else:
+                columns[name] = np.array(values, dtype=np.int32)
+        columns['strings'] = np.array(list(self.strings), dtype=str)
+        columns['chunk'] = np.array(self.n_chunked)
+        if self.deferred:
+            columns['initial_timestamp'] = np.array(self.initial_timestamp, dtype='datetime64[us]')
+        self.n_chunked += 1
+        return columns
+
+    def pop_chunk(self):
+        """ Detaches and returns the oldest full chunk """
+        return self._chunks.popleft()
+
+    def pull(self):
+        """ Detaches and returns the chunks of all the pending rows """
+        chunks = list(self._chunks)
+        self._chunks.clear()
+        if self.n_rows:
+            chunks.append(self._columns())
+            self._new_rows()
+        return chunks
+
+    def courses(self):
+        """ `DiseaseCourses` of the humans met so far, to read the deferred rows """
+        return DiseaseCourses(self.initial_timestamp, self.humans, self.locations)
+
+
+def dumps_columns(columns):
+    f = io.BytesIO()
+    np.savez_compressed(f, **columns)
+    return f.getvalue()
+
+
+def loads_columns(data):
+    with np.load(io.BytesIO(data), allow_pickle=False) as npz:
+        return {name: npz[name] for name in npz.files}
+
+
+def is_deferred(columns):
+    return 'tick' in columns
+
+
+def _decode_column(columns, name, kind, strings):
+    """ Column `name` as a list of the values logged """
+    column = columns[name]
+    if kind == 'list':
+        codes = strings[columns[f"{name}.values"]].tolist()
+        lengths = column.tolist()
+        values, start = [], 0
+        for n in lengths:
+            if n < 0:
+                values.append(None)
+            else:
+                values.append(codes[start:start + n])
+                start += n
+        return values
+    if kind == 'int':
+        return [None if x == NULL_INT else x for x in column.tolist()]
+    if kind == 'bool':
+        return [None if x < 0 else bool(x) for x in column.tolist()]
+    if kind == 'float':
+        return [None if x != x else x for x in column.tolist()]
+    if kind == 'str':
+        return strings[column].tolist()
+    return column.tolist()
+
+
+def _materialize(columns, courses):
+    """ Columns of `FIELDS` recomputed from the deferred rows of `columns` and the `DiseaseCourses` """
+    from base import Location
+    from simulator import Human
+
+    HumanView = type('HumanView', (object,), {key: getattr(Human, key) for key in HUMAN_PROPERTIES})
+    LocationView = type('LocationView', (object,), {key: getattr(Location, key) for key in LOCATION_PROPERTIES})
+
+    env = types.SimpleNamespace(now=None, timestamp=None)
+    locations = {}
+    for name, attributes in courses.locations.items():
+        locations[name] = LocationView()
+        locations[name].__dict__.update(attributes, env=env)
+    humans = {}
+    for human_id, attributes in courses.humans.items():
+        humans[human_id] = HumanView()
+        humans[human_id].__dict__.update(attributes, env=env, household=locations[attributes['household']])
+
+    def timestamp(tick):
+        # as `Env.timestamp`
+        return courses.initial_timestamp + datetime.timedelta(minutes=tick * TICK_MINUTE)
+
+    facts = {name: _decode_column(columns, name, kind, columns['strings']) for name, kind in FACT_FIELDS}
+    n_rows = len(facts['tick'])
+    values = {name: [] for name, _ in FIELDS}
+    # the noise of the observed coordinates is drawn when reading, from a stream of the chunk
+    noise = np.random.RandomState(int(columns['chunk'])).normal(0, 2 if LOCATION_TECH == 'bluetooth' else 10, (n_rows, 2, 2))
+    for row in range(n_rows):
+        env.now = facts['tick'][row]
+        env.timestamp = timestamp(env.now)
+        location = locations[facts['location'][row]]
+        location.contamination_timestamp = facts['contamination_timestamp'][row]
+        location.max_day_contamination = facts['max_day_contamination'][row]
+        infectee = facts['infectee'][row]
+
+        for name, value in [('time', env.timestamp), ('location', location.name),
+                            ('location_type', location.location_type), ('lat', location.lat), ('lon', location.lon),
+                            ('contamination_probability', location.contamination_probability),
+                            ('social_contact_factor', location.social_contact_factor),
+                            ('duration', facts['duration'][row]), ('distance', facts['distance'][row]),
+                            ('infectee', infectee)]:
+            values[name].append(value)
+
+        pair = []
+        for i in [0, 1]:
+            prefix = f"human{i + 1}_"
+            human = humans[facts[prefix + 'id'][row]]
+            pair.append(human)
+            human.location = location
+            human.obs_hospitalized = facts[prefix + 'obs_hospitalized'][row]
+            human.obs_in_icu = facts[prefix + 'obs_in_icu'][row]
+            # as set by `Human.infection_timestamp`
+            human.infection_tick = facts[prefix + 'infection_tick'][row]
+            if human.infection_tick is None:
+                human.infection_timestamp = human.infectious_tick = None
+            else:
+                human.infection_timestamp = timestamp(human.infection_tick)
+                human.infectious_tick = human.infection_tick + (human.incubation_days - INFECTIOUSNESS_ONSET_DAYS) * TICKS_PER_DAY
+
+            values[prefix + 'id'].append(facts[prefix + 'id'][row])
+            values[prefix + 'location_is_residence'].append(human.household is location)
+            for key, _ in H_OBS_FIELDS + H_UNOBS_FIELDS:
+                if key == 'obs_lat':
+                    value = round(location.lat + noise[row, i, 0])
+                elif key == 'obs_lon':
+                    value = round(location.lon + noise[row, i, 1])
+                else:
+                    value = getattr(human, key)
+                values[prefix + key].append(value)
+
+        values['same_household'].append(pair[0].household is pair[1].household and location is pair[0].household)
+        if infectee:
+            human = pair[infectee - 1]
+            start = human.infection_timestamp + datetime.timedelta(days=human.incubation_days - INFECTIOUSNESS_ONSET_DAYS)
+        values['infectiousness_start_time'].append(start if infectee else None)
+
+    return values
+
+
+def iter_encounter_events(columns, courses=None):
+    """
+    Yields the events `Event.log_encounter` logs for the encounters of a chunk; the chunks of
+    DEFERRED_ENCOUNTER_PAYLOAD are read with the `DiseaseCourses` of the run
+    """
+    if is_deferred(columns):
+        if courses is None:
+            raise ValueError("reading deferred encounters needs the disease courses of the humans")
+        values = _materialize(columns, courses)
+    else:
+        values = {name: _decode_column(columns, name, kind, columns['strings']) for name, kind in FIELDS}
+
+    for row in range(len(values['time'])):
+        exposed = values['infectee'][row]
+        same_household = values['same_household'][row]
+        obs, unobs = [], []
+        for i in [1, 2]:
+            prefix = f"human{i}_"
+            obs.append({key: values[prefix + key][row] for key, _ in H_OBS_FIELDS})
+            u = {key: values[prefix + key][row] for key, _ in H_UNOBS_FIELDS}
+            u['human_id'] = f"human:{values[prefix + 'id'][row]}"
+            u['location_is_residence'] = values[prefix + 'location_is_residence'][row]
+            u['got_exposed'] = exposed == i if exposed else False
+            u['exposed_other'] = exposed != i if exposed else False
+            u['same_household'] = same_household
+            u['infectiousness_start_time'] = values['infectiousness_start_time'][row] if u['got_exposed'] else None
+            unobs.append(u)
+
+        loc_obs = {key: values[key][row] for key in ['location_type', 'lat', 'lon']}
+        loc_unobs = {key: values[key][row] for key in ['contamination_probability', 'social_contact_factor']}
+        loc_unobs['location_p_infection'] = loc_unobs['contamination_probability'] / loc_unobs['social_contact_factor']
+        other_obs = {'duration': values['duration'][row], 'distance': values['distance'][row]}
+
+        both_have_app = obs[0]['has_app'] and obs[1]['has_app']
+        for i in [0, 1]:
+            if both_have_app:
+                obs_payload = {**loc_obs, **other_obs, 'human1': obs[i], 'human2': obs[1 - i]}
+                unobs_payload = {**loc_unobs, 'human1': unobs[i], 'human2': unobs[1 - i]}
+            else:
+                obs_payload = {}
+                unobs_payload = {**loc_obs, **loc_unobs, **other_obs, 'human1': {**obs[i], **unobs[i]},
+                                 'human2': {**obs[1 - i], **unobs[1 - i]}}
+
+            yield {
+                'human_id': unobs[i]['human_id'],
+                'event_type': 'encounter',
+                'time': values['time'][row],
+                'payload': {'observed': obs_payload, 'unobserved': unobs_payload}
+            }
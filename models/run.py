@@ -4,6 +4,7 @@ sys.path.append(os.getcwd())
 import pickle
 import json
 from base import Event
+from archive import ArchiveReader
 import subprocess
 import numpy as np
 import operator
@@ -16,7 +17,7 @@ from plots.plot_risk import dist_plot, hist_plot
 if __name__ == "__main__":
     # TODO: add as args that can be called from cmdline
     PLOT_DAILY = False
-    PATH_TO_DATA = "output/data.pkl"
+    PATH_TO_DATA = "output/data.archive"
     PATH_TO_HUMANS = "output/humans.pkl"
     CLUSTER_PATH = "output/clusters.json"
     PATH_TO_PLOT = "plots/risk/"
@@ -28,9 +29,8 @@ if __name__ == "__main__":
 
     rng = np.random.RandomState(seed)
 
-    # read and filter the pickles
-    with open(PATH_TO_DATA, "rb") as f:
-        logs = pickle.load(f)
+    # read and filter the events
+    logs = list(ArchiveReader(PATH_TO_DATA).events())
     human_ids = set()
     enc_logs = []
     symp_logs = []
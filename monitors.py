@@ -1,16 +1,15 @@
-from config import TICK_MINUTE
+from config import TICK_MINUTE, UNCOMPRESSED_COLUMNS
 from base import City
 from simulator import Human
 from matplotlib import pyplot as plt
 import json
 import pylab as pl
-import pickle
 import numpy as np
 import pandas as pd
-from datetime import datetime
 import threading
-import zipfile
 from utils import _json_serialize
+from encounters import DiseaseCourses, is_deferred, iter_encounter_events
+from archive import ArchiveReader, append_chunk
 
 
 class BaseMonitor(object):
@@ -33,15 +32,9 @@ class SEIRMonitor(BaseMonitor):
     def run(self, env, city: City):
 
         while True:
-            S, E, I, R = 0, 0, 0, 0
             R0 = city.tracker.get_R0()
             G = city.tracker.get_generation_time()
-
-            for h in city.humans:
-                S += h.is_susceptible
-                E += h.is_exposed
-                I += h.is_infectious
-                R += h.is_removed
+            S, E, I, R = city.population.seir_counts(env.now)
 
             print(env.timestamp, f"Ro: {R0:5.2f} G:{G:5.2f} S:{S} E:{E} I:{I} R:{R}")
             self.data.append({
@@ -58,27 +51,47 @@ class EventMonitor(BaseMonitor):
 
     def __init__(self, f=None, dest: str = None, chunk_size: int = None):
         super().__init__(f, dest, chunk_size)
+        self.event_bus = None
+        self.encounter_log = None
         self._iothread = threading.Thread()
         self._iothread.start()
 
 
     def run(self, env, city: City):
+        self.event_bus, self.encounter_log = env.event_bus, env.encounter_log
+        self.event_bus.chunk_size = self.encounter_log.chunk_size = self.chunk_size
         while True:
-            self.data = city.events
-
-            if self.chunk_size and len(self.data) > self.chunk_size:
-                self.data = city.pull_events()
-                self.dump()
+            while self.event_bus.n_chunks:
+                self.data = self.event_bus.pop_chunk()
+                self.write(self.data)
+            while self.encounter_log.n_chunks:
+                self.write(self.encounter_log.pop_chunk())
+            self.data = self.event_bus.current
 
             yield env.timeout(self.f / TICK_MINUTE)
 
     def dump(self):
+        if self.event_bus is not None and self.event_bus.n_chunks:
+            # chunks cut since the last tick
+            self.data = self.event_bus.pull()
+        self.write(self.data)
+        if self.encounter_log is not None:
+            for columns in self.encounter_log.pull():
+                self.write(columns)
+            if self.encounter_log.deferred:
+                self.write(self.encounter_log.courses())
+
+    def write(self, data):
         if self.dest is None:
-            print(json.dumps(self.data, indent=1, default=_json_serialize))
+            if isinstance(data, DiseaseCourses):
+                return
+            if isinstance(data, dict):
+                data = {name: column.tolist() for name, column in data.items()} if is_deferred(data) else list(iter_encounter_events(data))
+            print(json.dumps(data, indent=1, default=_json_serialize))
             return
 
         self._iothread.join()
-        self._iothread = threading.Thread(target=EventMonitor.dump_chunk, args=(self.data, self.dest))
+        self._iothread = threading.Thread(target=EventMonitor.dump_chunk, args=(data, self.dest))
         self._iothread.start()
 
     def join_iothread(self):
@@ -86,9 +99,12 @@ class EventMonitor(BaseMonitor):
 
     @staticmethod
     def dump_chunk(data, dest):
-        timestamp = datetime.utcnow().timestamp()
-        with zipfile.ZipFile(f"{dest}.zip", mode='a', compression=zipfile.ZIP_STORED) as zf:
-            zf.writestr(f"{timestamp}.pkl", pickle.dumps(data))
+        append_chunk(f"{dest}.archive", data, uncompressed=UNCOMPRESSED_COLUMNS)
+
+    @staticmethod
+    def load(dest):
+        """ Events of the chunks written to `dest`, with the encounters of the column chunks as dicts """
+        return list(ArchiveReader(f"{dest}.archive").events())
 
 class TimeMonitor(BaseMonitor):
 
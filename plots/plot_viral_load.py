@@ -36,7 +36,7 @@ def piecewise_linear(x, rng, NUM_PEOPLE):
             else:
                 cur_viral_load = plateau_height - plateau_height * (time_sample - plateau_end) / (recovered - plateau_end)
             if cur_viral_load < 0:
-                cur_viral_load = np.array([0.])
+                cur_viral_load = 0.
 
             viral_load.append(cur_viral_load)
 
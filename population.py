@@ -0,0 +1,241 @@
+import numpy as np
+
+from config import *
+from utils import _get_random_sexes, _get_preexisting_conditions_batch, _draw_random_discreet_gaussians, \
+    _sample_viral_load_piecewise_batch, _get_all_symptoms_batch, _reported_symptoms_batch
+
+# per-human scalars kept in the arrays of `Population`, with their dtype
+COLUMNS = {
+    # traits
+    'age': np.int32,
+    'carefulness': np.float64,
+    'has_app': np.bool_,
+    'has_cold': np.bool_,
+    'has_flu': np.bool_,
+    'travelled_recently': np.bool_,
+    'rho': np.float64,
+    'gamma': np.float64,
+    'adjust_gamma': np.float64,
+
+    # disease course
+    'incubation_days': np.int32,
+    'recovery_days': np.int32,
+    'is_asymptomatic': np.bool_,
+    'asymptomatic_infection_ratio': np.float64,
+    'gets_really_sick': np.bool_,
+    'gets_extremely_sick': np.bool_,
+    'never_recovers': np.bool_,
+    'viral_load_plateau_height': np.float64,
+    'viral_load_plateau_start': np.float64,
+    'viral_load_plateau_end': np.float64,
+    'viral_load_recovered': np.float64,
+    'disease_seed': np.int64, # LAZY_DISEASE_COURSE
+
+    # state
+    'is_immune': np.bool_,
+    'is_removed': np.bool_,
+    'death': np.bool_,
+    'rest_at_home': np.bool_,
+    'obs_hospitalized': np.bool_,
+    'obs_in_icu': np.bool_,
+    'has_logged_symptoms': np.bool_,
+    'has_logged_test': np.bool_,
+    'has_logged_info': np.bool_,
+    'n_infectious_contacts': np.int32,
+    'infection_tick': np.float64,
+    'infectious_tick': np.float64,
+    'incubated_tick': np.float64,
+    'recovery_tick': np.float64,
+    'symptom_start_tick': np.float64,
+
+    # habits
+    'avg_shopping_time': np.int32,
+    'scale_shopping_time': np.int32,
+    'avg_exercise_time': np.int32,
+    'scale_exercise_time': np.int32,
+    'avg_working_minutes': np.int32,
+    'scale_working_minutes': np.int32,
+    'avg_hospital_hours': np.int32,
+    'scale_hospital_hours': np.int32,
+    'avg_misc_time': np.int32,
+    'scale_misc_time': np.int32,
+    'number_of_shopping_days': np.int32,
+    'number_of_shopping_hours': np.int32,
+    'number_of_exercise_days': np.int32,
+    'number_of_exercise_hours': np.int32,
+    'max_shop_per_week': np.int32,
+    'max_exercise_per_week': np.int32,
+    'count_shop': np.int32,
+    'count_exercise': np.int32,
+}
+
+# columns where None is stored as NaN
+NULLABLE_COLUMNS = {'infection_tick', 'infectious_tick', 'incubated_tick', 'recovery_tick', 'symptom_start_tick'}
+
+
+class Population(object):
+    """
+    Struct-of-arrays store of the per-human scalars. Row `idx` of every array belongs to the
+    human with that index; `Human` reads and writes its row through the `Column` descriptors,
+    and population-wide queries are computed on the arrays directly.
+    """
+
+    def __init__(self, n, sim_days=0):
+        self.n = n
+        for name, dtype in COLUMNS.items():
+            if name in NULLABLE_COLUMNS:
+                setattr(self, name, np.full(n, np.nan, dtype=dtype))
+            else:
+                setattr(self, name, np.zeros(n, dtype=dtype))
+        self.mask_wearing = np.zeros((n, sim_days), dtype=np.bool_)
+        # (n, number of stores/parks) matrices, set by the city once the households are known. With
+        # PREFERENCES_TOP_K, only the preferences for the k nearest ones are kept, and *_preferred
+        # holds their indices in city.stores/city.parks
+        self.stores_preferences = None
+        self.parks_preferences = None
+        self.stores_preferred = None
+        self.parks_preferred = None
+
+    def synthesize(self, ages, rng):
+        """
+        Draws the traits of the whole population at once (BATCHED_POPULATION_SYNTHESIS); the
+        distributions are those of `Human._draw_traits`. Fills the columns and returns, for each
+        human, the dict of the traits that are not stored in columns.
+        """
+        n = self.n
+        ages = np.asarray(ages)
+        self.age[:] = ages
+        sexes = _get_random_sexes(n, rng)
+        conditions = _get_preexisting_conditions_batch(ages, sexes, rng)
+        self.travelled_recently[:] = rng.random_sample(n) > 0.9
+
+        # &carefulness
+        careful = rng.random_sample(n) < P_CAREFUL_PERSON
+        self.carefulness[:] = (np.round(rng.normal(np.where(careful, 55, 25), 10)) + ages/2) / 100
+        self.mask_wearing[:] = rng.random_sample(self.mask_wearing.shape) < self.carefulness[:, None] * BASELINE_P_MASK
+
+        age_modifier = np.where((ages > 40) | (ages < 12), 2, 1)
+        self.has_cold[:] = rng.random_sample(n) < P_COLD * age_modifier
+        self.has_flu[:] = rng.random_sample(n) < P_FLU * age_modifier
+        self.has_app[:] = rng.random_sample(n) < (P_HAS_APP / age_modifier) + (self.carefulness / 2)
+        self.incubation_days[:] = _draw_random_discreet_gaussians(np.full(n, AVG_INCUBATION_DAYS), SCALE_INCUBATION_DAYS, rng)
+
+        self.gets_really_sick[:] = rng.random_sample(n) >= 0.8 + (ages/100)
+        self.gets_extremely_sick[:] = self.gets_really_sick & (rng.random_sample(n) >= 0.7)
+        self.never_recovers[:] = rng.random_sample(n) <= np.take(P_NEVER_RECOVERS, np.minimum(ages // 10, 8))
+
+        # &symptoms, &viral-load
+        self.is_asymptomatic[:] = rng.random_sample(n) > (BASELINE_P_ASYMPTOMATIC - (ages - 50) * 0.5) / 100
+        self.asymptomatic_infection_ratio[:] = np.where(self.is_asymptomatic, ASYMPTOMATIC_INFECTION_RATIO, 0.0)
+        self.recovery_days[:] = _draw_random_discreet_gaussians(np.full(n, AVG_RECOVERY_DAYS), SCALE_RECOVERY_DAYS, rng)
+        if LAZY_DISEASE_COURSE:
+            # drawn at infection by Human._draw_disease_course
+            self.disease_seed[:] = rng.randint(2**31, size=n)
+            all_symptoms = all_reported_symptoms = [None] * n
+        else:
+            (self.viral_load_plateau_height[:], self.viral_load_plateau_start[:],
+             self.viral_load_plateau_end[:], self.viral_load_recovered[:]) = _sample_viral_load_piecewise_batch(rng, ages)
+            all_symptoms = _get_all_symptoms_batch(
+                self.viral_load_plateau_start, self.viral_load_plateau_end, self.viral_load_recovered,
+                self.incubation_days, self.gets_really_sick, self.gets_extremely_sick,
+                np.array([len(x) > 0 for x in conditions], dtype=bool), rng)
+            all_reported_symptoms = _reported_symptoms_batch(all_symptoms, rng, self.carefulness)
+
+        # humans can only log the symptoms they have on the first day, checked by Human once infected
+        self.has_logged_symptoms[:] = self.has_app & (rng.random_sample(n) < 0.5)
+        self.has_logged_test[:] = self.has_app & (rng.random_sample(n) < 0.5)
+        self.has_logged_info[:] = self.has_app & (rng.random_sample(n) < 0.5)
+
+        # habits
+        for name, avg, scale in [
+            ('avg_shopping_time', AVG_SHOP_TIME_MINUTES, SCALE_SHOP_TIME_MINUTES),
+            ('scale_shopping_time', AVG_SCALE_SHOP_TIME_MINUTES, SCALE_SCALE_SHOP_TIME_MINUTES),
+            ('avg_exercise_time', AVG_EXERCISE_MINUTES, SCALE_EXERCISE_MINUTES),
+            ('scale_exercise_time', AVG_SCALE_EXERCISE_MINUTES, SCALE_SCALE_EXERCISE_MINUTES),
+            ('avg_working_minutes', AVG_WORKING_MINUTES, SCALE_WORKING_MINUTES),
+            ('scale_working_minutes', AVG_SCALE_WORKING_MINUTES, SCALE_SCALE_WORKING_MINUTES),
+            ('avg_hospital_hours', AVG_HOSPITAL_HOURS, SCALE_HOSPITAL_HOURS),
+            ('scale_hospital_hours', AVG_SCALE_HOSPITAL_HOURS, SCALE_SCALE_HOSPITAL_HOURS),
+            ('avg_misc_time', AVG_MISC_MINUTES, SCALE_MISC_MINUTES),
+            ('scale_misc_time', AVG_SCALE_MISC_MINUTES, SCALE_SCALE_MISC_MINUTES),
+            ('number_of_shopping_days', AVG_NUM_SHOPPING_DAYS, SCALE_NUM_SHOPPING_DAYS),
+            ('number_of_shopping_hours', AVG_NUM_SHOPPING_HOURS, SCALE_NUM_SHOPPING_HOURS),
+            ('number_of_exercise_days', AVG_NUM_EXERCISE_DAYS, SCALE_NUM_EXERCISE_DAYS),
+            ('number_of_exercise_hours', AVG_NUM_EXERCISE_HOURS, SCALE_NUM_EXERCISE_HOURS),
+            ('max_shop_per_week', AVG_MAX_NUM_SHOP_PER_WEEK, SCALE_MAX_NUM_SHOP_PER_WEEK),
+            ('max_exercise_per_week', AVG_MAX_NUM_EXERCISE_PER_WEEK, SCALE_MAX_NUM_EXERCISE_PER_WEEK),
+        ]:
+            getattr(self, name)[:] = _draw_random_discreet_gaussians(np.full(n, avg), scale, rng)
+
+        # multiple shopping and exercise days and hours, drawn with replacement
+        def split(low, high, counts):
+            return np.split(rng.randint(low, high, counts.sum()), np.cumsum(counts)[:-1])
+        shopping_days = split(0, 7, self.number_of_shopping_days)
+        shopping_hours = split(7, 20, self.number_of_shopping_hours)
+        exercise_days = split(0, 7, self.number_of_exercise_days)
+        exercise_hours = split(7, 20, self.number_of_exercise_hours)
+        work_start_hour = rng.randint(7, 12, (n, 3))
+
+        return [
+            {
+                'sex': sexes[i].item(),
+                'preexisting_conditions': conditions[i],
+                'all_symptoms': all_symptoms[i],
+                'all_reported_symptoms': all_reported_symptoms[i],
+                'shopping_days': shopping_days[i],
+                'shopping_hours': shopping_hours[i],
+                'exercise_days': exercise_days[i],
+                'exercise_hours': exercise_hours[i],
+                'work_start_hour': work_start_hour[i],
+            }
+            for i in range(n)
+        ]
+
+    def __len__(self):
+        return self.n
+
+    # NaN ticks (not infected) compare False
+    def is_exposed(self, now):
+        with np.errstate(invalid='ignore'):
+            return now < self.infectious_tick
+
+    def is_infectious(self, now):
+        with np.errstate(invalid='ignore'):
+            return now >= self.infectious_tick
+
+    def is_susceptible(self, now):
+        return ~self.is_exposed(now) & ~self.is_infectious(now) & ~self.is_removed & ~self.is_immune
+
+    def seir_counts(self, now):
+        """ Number of susceptible, exposed, infectious and removed humans at tick `now` """
+        return (int(self.is_susceptible(now).sum()), int(self.is_exposed(now).sum()),
+                int(self.is_infectious(now).sum()), int(self.is_removed.sum()))
+
+
+class Column(object):
+    """ Attribute of a human stored in the `name` array of its population """
+    __slots__ = ('name', 'nullable')
+
+    def __init__(self, name):
+        self.name = name
+        self.nullable = name in NULLABLE_COLUMNS
+
+    def __get__(self, human, owner=None):
+        if human is None:
+            return self
+        value = getattr(human.population, self.name).item(human.idx)
+        if self.nullable and value != value:
+            return None
+        return value
+
+    def __set__(self, human, value):
+        if value is None:
+            value = np.nan
+        getattr(human.population, self.name)[human.idx] = value
+
+
+def bind_columns(cls):
+    """ Class decorator exposing the columns of `Population` as attributes of `cls` """
+    for name in COLUMNS:
+        setattr(cls, name, Column(name))
+    return cls
@@ -8,9 +8,10 @@ import zipfile
 
 from config import TICK_MINUTE
 from simulator import Human
-from base import *
 from utils import log, _draw_random_discreet_gaussian, _get_random_age, _get_random_area
 from monitors import EventMonitor, TimeMonitor, SEIRMonitor
+from vectorized import VectorizedEngine
+from city_cache import load_or_build_city
 
 
 @click.group()
@@ -25,12 +26,13 @@ def simu():
 @click.option('--out_chunk_size', help='number of events per dump in outfile', type=int, default=25000, required=False)
 @click.option('--print_progress', is_flag=True, help='print the evolution of days', default=False)
 @click.option('--seed', help='seed for the process', type=int, default=0)
+@click.option('--engine', help='one simpy process per human, or hourly steps over the whole population', type=click.Choice(['simpy', 'vectorized']), default='simpy')
 def sim(n_people=None,
         init_percent_sick=0,
         start_time=datetime.datetime(2020, 2, 28, 0, 0),
         simulation_days=10,
         outdir=None, out_chunk_size=None,
-        print_progress=False, seed=0):
+        print_progress=False, seed=0, engine='simpy'):
 
     os.makedirs("output", exist_ok=True)
 
@@ -45,7 +47,8 @@ def sim(n_people=None,
         simulation_days=simulation_days,
         outfile=outfile, out_chunk_size=out_chunk_size,
         print_progress=print_progress,
-        seed=seed
+        seed=seed,
+        engine=engine
     )
     monitors[0].dump()
     monitors[0].join_iothread()
@@ -135,14 +138,13 @@ def run_simu(n_people=None, init_percent_sick=0,
              start_time=datetime.datetime(2020, 2, 28, 0, 0),
              simulation_days=10,
              outfile=None, out_chunk_size=None,
-             print_progress=False, seed=0, other_monitors=[]):
+             print_progress=False, seed=0, other_monitors=[], engine='simpy'):
 
     rng = np.random.RandomState(seed)
-    env = Env(start_time)
 
     city_x_range = (0,1000)
     city_y_range = (0,1000)
-    city = City(env, n_people, rng, city_x_range, city_y_range, start_time, init_percent_sick, Human, simulation_days)
+    env, city = load_or_build_city(start_time, n_people, rng, city_x_range, city_y_range, init_percent_sick, Human, simulation_days)
 
     monitors = [EventMonitor(f=120, dest=outfile, chunk_size=out_chunk_size), SEIRMonitor(f=1440)]
     # run the simulation
@@ -152,8 +154,11 @@ def run_simu(n_people=None, init_percent_sick=0,
     if other_monitors:
         monitors += other_monitors
 
-    for human in city.humans:
-        env.process(human.run(city=city))
+    if engine == 'vectorized':
+        env.process(VectorizedEngine(city).run())
+    else:
+        for human in city.humans:
+            env.process(human.run(city=city))
 
     for m in monitors:
         env.process(m.run(env, city=city))
@@ -0,0 +1,136 @@
+from functools import lru_cache
+
+import numpy as np
+
+
+class CategoricalSampler(object):
+    """
+    `rng.choice(values, size, p=p)` with the cumulative probabilities computed once. The draws
+    are the ones `rng.choice` makes from the same random stream.
+    """
+
+    def __init__(self, values, p):
+        self.values = np.arange(values) if isinstance(values, int) else np.array(values)
+        # as in RandomState.choice
+        self.cdf = np.cumsum(np.asarray(p, dtype=np.float64))
+        self.cdf /= self.cdf[-1]
+
+    def __len__(self):
+        return len(self.values)
+
+    def sample_index(self, rng, size=None):
+        """ Index (or array of `size` indices) of the values drawn """
+        return self.cdf.searchsorted(rng.random_sample(size), side='right')
+
+    def sample(self, rng, size=None):
+        return self.values[self.sample_index(rng, size)]
+
+
+@lru_cache(500)
+def categorical(values, p):
+    """ Cached `CategoricalSampler` of the tuples `values` and `p` """
+    return CategoricalSampler(values, p)
+
+
+def choice_index(rng, weights):
+    """ Index drawn in proportion to `weights`, as `rng.choice(len(weights), p=_normalize_scores(weights))` """
+    p = np.asarray(weights, dtype=np.float64)
+    cdf = np.cumsum(p / p.sum())
+    cdf /= cdf[-1]
+    return int(cdf.searchsorted(rng.random_sample(), side='right'))
+
+
+def sample_distinct(rng, n, k):
+    """ `k` distinct indices of range(n), uniformly at random and sorted, in O(k) (Floyd's algorithm) """
+    selected = set()
+    for j, t in zip(range(n - k, n), rng.randint(0, np.arange(n - k + 1, n + 1)).tolist()):
+        selected.add(j if t in selected else t)
+    return sorted(selected)
+
+
+class CDFSampler(object):
+    """
+    Draws indices in proportion to fixed weights by inverting their cumulative sum, in O(log n).
+    Like `rng.choice(n, p=weights / weights.sum())`, a draw uses a single uniform sample.
+    """
+
+    def __init__(self, weights):
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self.cdf = np.cumsum(self.weights)
+
+    def __len__(self):
+        return len(self.weights)
+
+    def sample(self, rng, excluded=()):
+        """ Draws an index, with the weights of the `excluded` indices set to 0. Returns None if no weight is left. """
+        excluded = sorted(set(excluded))
+        total = self.cdf[-1] - self.weights[excluded].sum()
+        if total <= 0:
+            return None
+
+        u = rng.random_sample() * total
+        # move u past the intervals of the excluded indices that start before it
+        for j in excluded:
+            if self.cdf[j] - self.weights[j] > u:
+                break
+            u += self.weights[j]
+        return int(min(np.searchsorted(self.cdf, u, side='right'), len(self.cdf) - 1))
+
+
+class FenwickSampler(object):
+    """
+    Draws indices in proportion to weights that can change between draws. The weights are kept in a
+    Fenwick tree, so a draw and an update take O(log n). Like `CDFSampler`, a draw uses a single uniform sample.
+    """
+
+    def __init__(self, weights):
+        # kept as float64 arrays: a human holds one sampler per location type
+        self.weights = np.array(weights, dtype=np.float64)
+        self.n = len(self.weights)
+        self.n_positive = int(np.count_nonzero(self.weights > 0))
+
+        # tree[i] is the sum of the weights in (i - lowbit(i), i] (1-based)
+        i = np.arange(self.n + 1)
+        cdf = np.concatenate([[0.], np.cumsum(self.weights)])
+        self.tree = cdf - cdf[i - (i & -i)]
+        self.step = 1 << max(self.n.bit_length() - 1, 0)
+
+    def __len__(self):
+        return self.n
+
+    @property
+    def total(self):
+        total, i = 0., self.n
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+    def update(self, i, weight):
+        """ Sets the weight of index `i` """
+        delta = weight - self.weights[i]
+        self.n_positive += int(weight > 0) - int(self.weights[i] > 0)
+        self.weights[i] = weight
+        i += 1
+        while i <= self.n:
+            self.tree[i] += delta
+            i += i & -i
+
+    def sample(self, rng):
+        """ Draws an index. Returns None if all the weights are 0. """
+        if self.n_positive == 0:
+            return None
+
+        u = rng.random_sample() * self.total
+        pos, step, tree = 0, self.step, self.tree
+        while step:
+            if pos + step <= self.n and tree[pos + step] <= u:
+                pos += step
+                u -= tree[pos]
+            step >>= 1
+
+        if pos >= self.n or self.weights[pos] <= 0:
+            # rounding in the tree sums left u at the boundary of an index with weight 0
+            positive = np.flatnonzero(self.weights > 0)
+            pos = int(positive[np.abs(positive - pos).argmin()])
+        return pos
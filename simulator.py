@@ -9,12 +9,14 @@ from bitarray import bitarray
 import operator
 import math
 
-from utils import _normalize_scores, _get_random_age, _get_random_sex, _get_all_symptoms, \
+from utils import _get_random_age, _get_random_sex, _get_all_symptoms, \
     _get_preexisting_conditions, _draw_random_discreet_gaussian, _json_serialize, _sample_viral_load_piecewise, \
-    _get_random_area, _encode_message, _decode_message, float_to_binary, binary_to_float, _reported_symptoms, _get_mask_wearing
+    _get_random_area, _encode_message, _decode_message, float_to_binary, binary_to_float, _reported_symptoms, _get_mask_wearing, _get_feeling
 from config import *  # PARAMETERS
 
 from base import *
+from population import Population, bind_columns
+from samplers import FenwickSampler, categorical, choice_index
 
 if COLLECT_LOGS is False:
     Event = DummyEvent
@@ -27,6 +29,8 @@ class Visits(object):
         self.stores = defaultdict(int)
         self.hospitals = defaultdict(int)
         self.miscs = defaultdict(int)
+        # per location type, sampler of the places not visited yet (see Human._select_location)
+        self.samplers = {}
 
     @property
     def n_parks(self):
@@ -45,28 +49,79 @@ class Visits(object):
         return len(self.miscs)
 
 
+@bind_columns
 class Human(object):
+    # the per-human scalars (see population.COLUMNS) live in the arrays of `population`, at row `idx`
+    __slots__ = ('population', 'idx', 'env', 'name', 'rng', 'profession', 'sex', 'preexisting_conditions',
+                 'household', 'workplace', 'location', 'visits', '_infection_timestamp', '_recovered_timestamp',
+                 'historical_infection_timestamp', 'all_symptoms', 'all_reported_symptoms', 'r0', 'last_state',
+                 'symptom_start_time', 'obs_age', 'obs_sex', 'obs_preexisting_conditions', 'obs_symptoms',
+                 'shopping_days', 'shopping_hours', 'exercise_days', 'exercise_hours', 'work_start_hour',
+                 'leisure_countdown', 'hours_slept', 'leaving_time', 'start_time')
 
     def __init__(self, env, name, age, rng, infection_timestamp, household, workplace, profession, rho=0.3, gamma=0.21, symptoms=[],
-                 test_results=None, sim_days=0):
+                 test_results=None, sim_days=0, population=None, idx=None, traits=None):
+        if population is None:
+            population, idx = Population(1, sim_days), 0
+        self.population = population
+        self.idx = idx
         self.env = env
-        self._events = []
         self.name = f"human:{name}"
         self.rng = rng
         self.profession = profession
         self.death = False
 
         self.age = age
-        self.sex = _get_random_sex(self.rng)
-        self.preexisting_conditions = _get_preexisting_conditions(self.age, self.sex, self.rng)
-
         self.assign_household(household)
         self.workplace = workplace
         self.rho = rho
         self.gamma = gamma
         self.rest_at_home = False # to track mobility due to symptoms
-
         self.visits = Visits()
+        # drawn by _draw_disease_course
+        self.all_symptoms = None
+        self.all_reported_symptoms = None
+
+        # Indicates whether this person will show severe signs of illness.
+        self.is_immune = False
+        self.recovered_timestamp = datetime.datetime.min
+        self.obs_hospitalized = False
+        self.obs_in_icu = False
+
+        if traits is None:
+            self._draw_traits(infection_timestamp, sim_days)
+        else:
+            # drawn for the whole population by Population.synthesize, which also filled the columns
+            for key, value in traits.items():
+                setattr(self, key, value)
+            self.infection_timestamp = infection_timestamp
+            self.has_logged_symptoms = self.has_logged_symptoms and any(self.symptoms)
+
+        # counters and memory
+        self.r0 = []
+        self.last_state = self.state
+        self.n_infectious_contacts = 0
+        self.symptom_start_time = None
+        self.symptom_start_tick = None
+
+        self.obs_age = self.age if self.has_app and self.has_logged_info else None
+        self.obs_sex = self.sex if self.has_app and self.has_logged_info else None
+        self.obs_preexisting_conditions = self.preexisting_conditions if self.has_app and self.has_logged_info else None
+        self.obs_symptoms = self.symptoms if self.has_logged_symptoms else None
+
+        self.count_shop=0
+        self.count_exercise=0
+
+        # number of weekend hours left before the next leisure trip (EVENT_DRIVEN_SCHEDULER)
+        self.leisure_countdown = None
+        # hours of the last stay at home, each of which draws whether to rest at home (EVENT_DRIVEN_SCHEDULER)
+        self.hours_slept = 1
+
+    def _draw_traits(self, infection_timestamp, sim_days):
+        """ Draws the traits of this human, one at a time (see Population.synthesize for the batched draws) """
+        rng, age = self.rng, self.age
+        self.sex = _get_random_sex(self.rng)
+        self.preexisting_conditions = _get_preexisting_conditions(self.age, self.sex, self.rng)
         self.travelled_recently = self.rng.rand() > 0.9
 
         # &carefulness
@@ -84,15 +139,9 @@ class Human(object):
         self.has_app = self.rng.rand() < (P_HAS_APP / age_modifier) + (self.carefulness / 2)
         self.incubation_days = _draw_random_discreet_gaussian(AVG_INCUBATION_DAYS, SCALE_INCUBATION_DAYS, self.rng)
 
-        # Indicates whether this person will show severe signs of illness.
-        self.infection_timestamp = infection_timestamp
-        self.is_immune = False
-        self.recovered_timestamp = datetime.datetime.min
         self.gets_really_sick = self.rng.random() >= 0.8 + (age/100)
         self.gets_extremely_sick = self.gets_really_sick and self.rng.random() >= 0.7 # &severe; 30% of severe cases need ICU
         self.never_recovers = self.rng.random() <= P_NEVER_RECOVERS[min(math.floor(self.age/10),8)]
-        self.obs_hospitalized = False
-        self.obs_in_icu = False
 
         # &symptoms, &viral-load
         # probability of being asymptomatic is basically 50%, but a bit less if you're older
@@ -101,27 +150,17 @@ class Human(object):
         self.asymptomatic_infection_ratio = ASYMPTOMATIC_INFECTION_RATIO if self.is_asymptomatic else 0.0 # draw a beta with the distribution in documents
 
         self.recovery_days = _draw_random_discreet_gaussian(AVG_RECOVERY_DAYS, SCALE_RECOVERY_DAYS, self.rng) # make it IQR &recovery
-        self.viral_load_plateau_height, self.viral_load_plateau_start, self.viral_load_plateau_end, self.viral_load_recovered = _sample_viral_load_piecewise(rng, age=age)
-        self.all_symptoms = _get_all_symptoms(
-                          np.ndarray.item(self.viral_load_plateau_start), np.ndarray.item(self.viral_load_plateau_end),
-                          np.ndarray.item(self.viral_load_recovered), age=self.age, incubation_days=self.incubation_days,
-                                                          really_sick=self.gets_really_sick, extremely_sick=self.gets_extremely_sick,
-                          rng=self.rng, preexisting_conditions=self.preexisting_conditions)
-        self.all_reported_symptoms = _reported_symptoms(self.all_symptoms, self.rng, self.carefulness)
+        if LAZY_DISEASE_COURSE:
+            # the disease course is drawn at infection, from its own random stream
+            self.disease_seed = self.rng.randint(2**31)
+            self.infection_timestamp = infection_timestamp
+        else:
+            self.infection_timestamp = infection_timestamp
+            self._draw_disease_course(self.rng)
 
-        # counters and memory
-        self.r0 = []
         self.has_logged_symptoms = self.has_app and any(self.symptoms) and rng.rand() < 0.5
         self.has_logged_test = self.has_app and self.test_results and rng.rand() < 0.5
         self.has_logged_info = self.has_app and rng.rand() < 0.5
-        self.last_state = self.state
-        self.n_infectious_contacts = 0
-        self.symptom_start_time = None
-
-        self.obs_age = self.age if self.has_app and self.has_logged_info else None
-        self.obs_sex = self.sex if self.has_app and self.has_logged_info else None
-        self.obs_preexisting_conditions = self.preexisting_conditions if self.has_app and self.has_logged_info else None
-        self.obs_symptoms = self.symptoms if self.has_logged_symptoms else None
 
         # habits
         self.avg_shopping_time = _draw_random_discreet_gaussian(AVG_SHOP_TIME_MINUTES, SCALE_SHOP_TIME_MINUTES, self.rng)
@@ -159,37 +198,97 @@ class Human(object):
 
         #Limiting the number of hours spent shopping per week
         self.max_shop_per_week = _draw_random_discreet_gaussian(AVG_MAX_NUM_SHOP_PER_WEEK, SCALE_MAX_NUM_SHOP_PER_WEEK, self.rng)
-        self.count_shop=0
 
         #Limiting the number of hours spent exercising per week
         self.max_exercise_per_week = _draw_random_discreet_gaussian(AVG_MAX_NUM_EXERCISE_PER_WEEK, SCALE_MAX_NUM_EXERCISE_PER_WEEK, self.rng)
-        self.count_exercise=0
 
         self.work_start_hour = self.rng.choice(range(7, 12), 3)
 
+    def _draw_disease_course(self, rng):
+        """ Draws the viral load and the symptoms this human has once infected """
+        plateau_height, plateau_start, plateau_end, recovered = _sample_viral_load_piecewise(rng, age=self.age)
+        self.viral_load_plateau_height = plateau_height
+        self.viral_load_plateau_start = plateau_start
+        self.viral_load_plateau_end = plateau_end
+        self.viral_load_recovered = recovered
+        self.all_symptoms = _get_all_symptoms(
+                          self.viral_load_plateau_start, self.viral_load_plateau_end,
+                          self.viral_load_recovered, age=self.age, incubation_days=self.incubation_days,
+                                                          really_sick=self.gets_really_sick, extremely_sick=self.gets_extremely_sick,
+                          rng=rng, preexisting_conditions=self.preexisting_conditions)
+        self.all_reported_symptoms = _reported_symptoms(self.all_symptoms, rng, self.carefulness)
+
     def assign_household(self, location):
         self.household = location
         self.location = location
         if self.profession == "retired":
             self.workplace = location
 
+    @property
+    def mask_wearing(self):
+        return self.population.mask_wearing[self.idx]
+
+    @mask_wearing.setter
+    def mask_wearing(self, mask_wearing):
+        self.population.mask_wearing[self.idx] = mask_wearing
+
+    @property
+    def stores_preferences(self):
+        return self.population.stores_preferences[self.idx]
+
+    @property
+    def parks_preferences(self):
+        return self.population.parks_preferences[self.idx]
+
     def __repr__(self):
         return f"H:{self.name}, SEIR:{int(self.is_susceptible)}{int(self.is_exposed)}{int(self.is_infectious)}{int(self.is_removed)}"
 
     ########### MEMORY OPTIMIZATION ###########
     @property
     def events(self):
-        return self._events
+        return self.env.event_bus
+
+    ########### EPI ###########
+    # The disease course is stored as tick boundaries computed once at infection
+    # (infection -> infectious -> incubated (symptoms) -> recovery) so that the state
+    # checks below are integer comparisons against `env.now`.
 
-    def pull_events(self):
-        if self._events:
-            events = self._events
-            self._events = []
+    @property
+    def infection_timestamp(self):
+        return self._infection_timestamp
+
+    @infection_timestamp.setter
+    def infection_timestamp(self, timestamp):
+        self._infection_timestamp = timestamp
+        if timestamp is None:
+            self.infection_tick = None
+            self.infectious_tick = None
+            self.incubated_tick = None
+            self.recovery_tick = None
         else:
-            events = self._events
-        return events
+            self.infection_tick = self.env.tick(timestamp)
+            self.infectious_tick = self.infection_tick + (self.incubation_days - INFECTIOUSNESS_ONSET_DAYS) * TICKS_PER_DAY
+            self.incubated_tick = self.infection_tick + self.incubation_days * TICKS_PER_DAY
+            self.recovery_tick = self.infection_tick + self.recovery_days * TICKS_PER_DAY
+            if LAZY_DISEASE_COURSE and self.all_symptoms is None:
+                self._draw_disease_course(np.random.RandomState(self.disease_seed))
 
-    ########### EPI ###########
+        if self.location is not None and self in self.location.humans:
+            self.location.update_human_status(self)
+
+    @property
+    def recovered_timestamp(self):
+        return self._recovered_timestamp
+
+    @recovered_timestamp.setter
+    def recovered_timestamp(self, timestamp):
+        self._recovered_timestamp = timestamp
+        self.is_removed = timestamp == datetime.datetime.max
+
+    @property
+    def sickness_day(self):
+        """ Number of whole days since infection """
+        return int((self.env.now - self.infection_tick) // TICKS_PER_DAY)
 
     @property
     def is_susceptible(self):
@@ -197,20 +296,15 @@ class Human(object):
 
     @property
     def is_exposed(self):
-        return self.infection_timestamp is not None and self.env.timestamp - self.infection_timestamp < datetime.timedelta(days=self.incubation_days - INFECTIOUSNESS_ONSET_DAYS)
+        return self.infection_tick is not None and self.env.now < self.infectious_tick
 
     @property
     def is_infectious(self):
-        return self.infection_timestamp is not None and self.env.timestamp - self.infection_timestamp >= datetime.timedelta(days=self.incubation_days - INFECTIOUSNESS_ONSET_DAYS)
-
-    @property
-    def is_removed(self):
-        return self.recovered_timestamp == datetime.datetime.max
+        return self.infection_tick is not None and self.env.now >= self.infectious_tick
 
     @property
     def is_incubated(self):
-        return (not self.is_asymptomatic and self.infection_timestamp is not None and
-                self.env.timestamp - self.infection_timestamp >= datetime.timedelta(days=self.incubation_days))
+        return not self.is_asymptomatic and self.infection_tick is not None and self.env.now >= self.incubated_tick
 
     @property
     def state(self):
@@ -238,8 +332,8 @@ class Human(object):
 
     @property
     def symptoms(self):
-        if self.infection_timestamp is not None and not self.is_asymptomatic:
-            sickness_day = (self.env.timestamp - self.infection_timestamp).days
+        if self.infection_tick is not None and not self.is_asymptomatic:
+            sickness_day = self.sickness_day
             if sickness_day >= len(self.all_symptoms):
                 return []
             return self.all_symptoms[sickness_day]
@@ -247,14 +341,14 @@ class Human(object):
 
     def reported_symptoms(self):
         try:
-            sickness_day = (self.env.timestamp - self.infection_timestamp).days
+            sickness_day = self.sickness_day
             return self.all_reported_symptoms[sickness_day]
         except Exception as e:
             return []
 
     def reported_symptoms_for_sickness(self):
         try:
-            sickness_day = (self.env.timestamp - self.infection_timestamp).days
+            sickness_day = self.sickness_day
             all_reported_symptoms_till_day = []
             for day in range(sickness_day+1):
                 all_reported_symptoms_till_day.extend(self.all_reported_symptoms[sickness_day])
@@ -265,11 +359,10 @@ class Human(object):
     @property
     def viral_load(self):
         """ Calculates the elapsed time since infection, returning this person's current viral load"""
-        if not self.infection_timestamp:
+        if self.infection_tick is None:
             return 0.
         # calculates the time since infection in days
-        time_exposed = (self.env.timestamp - self.infection_timestamp)
-        time_exposed_days = time_exposed.days + time_exposed.seconds / 86400 #(seconds in a day)
+        time_exposed_days = (self.env.now - self.infection_tick) / TICKS_PER_DAY
 
         # implements the piecewise linear function
         if time_exposed_days < self.viral_load_plateau_start:
@@ -301,7 +394,7 @@ class Human(object):
     @property
     def wearing_mask(self):
         #TODO there HAS TO BE A BETTER WAY
-        today = (self.env.timestamp-self.env.initial_timestamp).days
+        today = int(self.env.now // TICKS_PER_DAY)
         if self.location == self.household:
             mask = False
         if self.location.location_type == 'store':
@@ -324,23 +417,7 @@ class Human(object):
         return 1
 
     def how_am_I_feeling(self):
-        current_symptoms = self.symptoms
-        if current_symptoms == []:
-            return 1.0
-
-        if sum(x in current_symptoms for x in ["severe", "extremely_severe", "trouble_breathing"]) > 0:
-            return 0.0
-
-        elif sum(x in current_symptoms for x in ["moderate", "mild", "fever"]) > 0:
-            return 0.3
-
-        elif sum(x in current_symptoms for x in ["cough", "fatigue", "gastro", "aches"]) > 0:
-            return 0.5
-
-        elif sum(x in current_symptoms for x in ["runny_nose", "loss_of_taste"]) > 0:
-            return 0.7
-
-        return 0.9
+        return _get_feeling(self.symptoms)
 
     def assert_state_changes(self):
         next_state = {0:[1], 1:[2], 2:[0, 3]}
@@ -355,19 +432,19 @@ class Human(object):
            1 2 3 4 5 6 7 8 9 10 11 12 13 14 15 16 17 18 19 20 21 22 23 24
            State  h h h h h h h h h sh sh h  h  h  ac h  h  h  h  h  h  h  h  h
         """
-        self.household.humans.add(self)
+        if COALESCE_HOME_STAYS or DEPARTURE_TIME_ENCOUNTERS:
+            self.household.add_human(self)
+        else:
+            self.household.humans.add(self)
         while True:
 
             # show symptoms
             if self.is_incubated and not self.has_logged_symptoms:
-                self.symptom_start_time = self.env.timestamp
-                city.tracker.track_generation_times(self.name) # it doesn't count environmental infection or primary case or asymptomatic/presymptomatic infections; refer the definition
-                Event.log_symptom_start(self, True, self.env.timestamp)
-                self.has_logged_symptoms = True
+                self.start_symptoms(city)
 
             # log test
             if (self.is_incubated and
-                self.env.timestamp - self.symptom_start_time > datetime.timedelta(days=TEST_DAYS) and
+                self.env.now - self.symptom_start_tick > TEST_DAYS * TICKS_PER_DAY and
                 not self.has_logged_test):
                 test_result, test_type = self.test_results()
                 Event.log_test(self, test_result, test_type, self.env.timestamp)
@@ -375,24 +452,11 @@ class Human(object):
                 assert self.has_logged_symptoms is True # FIXME: assumption might not hold
 
             # recover
-            if self.is_infectious and self.env.timestamp - self.infection_timestamp >= datetime.timedelta(days=self.recovery_days):
-                recovery_duration = self.recovery_days - self.incubation_days + INFECTIOUSNESS_ONSET_DAYS
-                city.tracker.track_recovery(self.n_infectious_contacts, recovery_duration)
-                if self.never_recovers:
-                    self.recovered_timestamp = datetime.datetime.max
-                    dead = True
-                else:
-                    if not REINFECTION_POSSIBLE:
-                        self.recovered_timestamp = datetime.datetime.max
-                        self.is_immune = not REINFECTION_POSSIBLE
-                    else:
-                        self.recovered_timestamp = self.env.timestamp
-                    self.never_recovers = self.rng.random() <= P_NEVER_RECOVERS[min(math.floor(self.age/10),8)]
-                    dead = False
-
-                self.infection_timestamp = None # indicates they are no longer infected
-                Event.log_recovery(self, self.env.timestamp, dead)
+            if self.is_infectious and self.env.now >= self.recovery_tick:
+                dead = self.recover(city)
                 if dead:
+                    if COALESCE_HOME_STAYS:
+                        self.leave_home(city)
                     yield self.env.timeout(np.inf)
 
             self.assert_state_changes()
@@ -407,7 +471,8 @@ class Human(object):
             # self.how_am_I_feeling = 0.0 (worst) --> rest_at_home = True
             if not self.rest_at_home:
                 # set it once for the rest of the disease path
-                if not self.rng.random() < self.how_am_I_feeling():
+                # one draw per hour: the feeling does not change while sleeping (milestones end the sleep)
+                if not self.rng.random() < self.how_am_I_feeling() ** self.hours_slept:
                     self.rest_at_home = True
 
             # happens when recovered
@@ -441,12 +506,109 @@ class Human(object):
                 yield  self.env.process(self.excursion(city, "exercise"))
 
             elif (self.env.is_weekend() and
-                    self.rng.random() < 0.05 and
+                    self.wants_leisure() and
                     not self.rest_at_home):
                 yield  self.env.process(self.excursion(city, "leisure"))
 
             # start from house all the time
-            yield self.env.process(self.at(self.household, city, 60))
+            if EVENT_DRIVEN_SCHEDULER:
+                self.hours_slept = self.hours_until_next_activity()
+                yield self.env.process(self.at(self.household, city, 60 * self.hours_slept))
+            else:
+                yield self.env.process(self.at(self.household, city, 60))
+
+    def start_symptoms(self, city):
+        self.symptom_start_time = self.env.timestamp
+        self.symptom_start_tick = self.env.now
+        city.tracker.track_generation_times(self.name) # it doesn't count environmental infection or primary case or asymptomatic/presymptomatic infections; refer the definition
+        Event.log_symptom_start(self, True, self.env.timestamp)
+        self.has_logged_symptoms = True
+
+    def recover(self, city):
+        """ Ends the infection at `recovery_tick`; returns whether the human died of it """
+        recovery_duration = self.recovery_days - self.incubation_days + INFECTIOUSNESS_ONSET_DAYS
+        city.tracker.track_recovery(self.n_infectious_contacts, recovery_duration)
+        if self.never_recovers:
+            self.recovered_timestamp = datetime.datetime.max
+            dead = True
+        else:
+            if not REINFECTION_POSSIBLE:
+                self.recovered_timestamp = datetime.datetime.max
+                self.is_immune = not REINFECTION_POSSIBLE
+            else:
+                self.recovered_timestamp = self.env.timestamp
+            self.never_recovers = self.rng.random() <= P_NEVER_RECOVERS[min(math.floor(self.age/10),8)]
+            dead = False
+
+        self.infection_timestamp = None # indicates they are no longer infected
+        Event.log_recovery(self, self.env.timestamp, dead)
+        return dead
+
+    ############################## SCHEDULING ##################################
+    def wants_leisure(self):
+        """ Draws whether the current weekend hour is spent on a leisure trip """
+        if not EVENT_DRIVEN_SCHEDULER:
+            return self.rng.random() < P_LEISURE_PER_WEEKEND_HOUR
+
+        # same geometric law as the hourly draw, but sampled once per trip so that
+        # the weekend hours spent sleeping at home can be counted down in advance
+        if self.leisure_countdown is None:
+            self.leisure_countdown = self.rng.geometric(P_LEISURE_PER_WEEKEND_HOUR)
+        self.leisure_countdown -= 1
+        if self.leisure_countdown <= 0:
+            self.leisure_countdown = None
+            return True
+        return False
+
+    def hours_until_next_activity(self):
+        """
+        Number of whole hours this human can stay at home before `run` has something to do.
+        Candidates are the next work start, shopping and exercise slots, the next leisure trip,
+        the start of the week (weekly counters are reset) and the milestones of the disease course.
+        """
+        hour, day = self.env.hour_of_day(), self.env.day_of_week()
+
+        # milestones of the disease course (in hours from now)
+        milestones = [MAX_SLEEP_HOURS]
+        if self.infection_tick is not None:
+            now = self.env.now
+            targets = [self.recovery_tick]
+            if not self.is_asymptomatic:
+                targets.append(self.incubated_tick)
+            # symptoms change every day of sickness
+            targets.append(self.infection_tick + (self.sickness_day + 1) * TICKS_PER_DAY)
+            if self.symptom_start_tick is not None and not self.has_logged_test:
+                targets.append(self.symptom_start_tick + TEST_DAYS * TICKS_PER_DAY)
+            for target in targets:
+                if target > now:
+                    milestones.append(math.ceil((target - now) / (TICKS_PER_DAY / 24)))
+        horizon = max(min(milestones), 1)
+
+        if self.leisure_countdown is None:
+            self.leisure_countdown = self.rng.geometric(P_LEISURE_PER_WEEKEND_HOUR)
+
+        weekend_hours = 0
+        for h in range(1, horizon):
+            hour_h = (hour + h) % 24
+            day_h = (day + (hour + h) // 24) % 7
+            if day_h == 0 and hour_h == 0:
+                break
+            if not WORK_FROM_HOME and day_h not in [0, 6] and hour_h in self.work_start_hour:
+                break
+            if hour_h in self.shopping_hours and day_h in self.shopping_days:
+                break
+            if hour_h in self.exercise_hours and day_h in self.exercise_days:
+                break
+            if day_h in [0, 6]:
+                if weekend_hours + 1 == self.leisure_countdown:
+                    break
+                weekend_hours += 1
+        else:
+            h = horizon
+
+        # weekend hours slept through count as hours without leisure
+        self.leisure_countdown -= weekend_hours
+        return h
 
     ############################## MOBILITY ##################################
     @property
@@ -495,7 +657,7 @@ class Human(object):
             if hospital is None: # no more hospitals
                 yield self.env.timeout(np.inf)
 
-            t = self.recovery_days -(self.env.timestamp - self.infection_timestamp).total_seconds() / 86400 # DAYS
+            t = (self.recovery_tick - self.env.now) / TICKS_PER_DAY # DAYS
             yield self.env.process(self.at(hospital, city, t * 24 * 60))
 
         elif type == "hospital-icu":
@@ -504,10 +666,10 @@ class Human(object):
                 yield self.env.timeout(np.inf)
 
             if len(self.preexisting_conditions) < 2:
-                extra_time = self.rng.choice([1, 2, 3], p=[0.5, 0.3, 0.2])
+                extra_time = categorical((1, 2, 3), (0.5, 0.3, 0.2)).sample(self.rng)
             else:
-                extra_time = self.rng.choice([1, 2, 3], p=[0.2, 0.3, 0.5]) # DAYS
-            t = self.viral_load_plateau_end[0] - self.viral_load_plateau_start[0] + extra_time
+                extra_time = categorical((1, 2, 3), (0.2, 0.3, 0.5)).sample(self.rng) # DAYS
+            t = self.viral_load_plateau_end - self.viral_load_plateau_start + extra_time
 
             yield self.env.process(self.at(icu, city, t * 24 * 60))
 
@@ -531,6 +693,12 @@ class Human(object):
 
 
     def at(self, location, city, duration):
+        if COALESCE_HOME_STAYS:
+            if location == self.household:
+                yield from self.stay_home(city, duration)
+                return
+            self.leave_home(city)
+
         city.tracker.track_trip(from_location=self.location.location_type, to_location=location.location_type, age=self.age, hour=self.env.hour_of_day())
 
         # add the human to the location
@@ -538,67 +706,119 @@ class Human(object):
         location.add_human(self)
         self.leaving_time = duration + self.env.now
         self.start_time = self.env.now
-        area = self.location.area
 
         # Report all the encounters (epi transmission)
-        for h in location.humans:
-            if h == self:
-                continue
+        if not DEPARTURE_TIME_ENCOUNTERS:
+            others, distance, track_pairs = self._encounter_candidates(location, city)
+            if others:
+                self._resolve_encounters(others, location, city, self._overlaps(others, location), track_pairs, distance)
 
-            distance =  np.sqrt(int(area/len(self.location.humans))) + self.rng.randint(MIN_DIST_ENCOUNTER, MAX_DIST_ENCOUNTER)
-            t_overlap = min(self.leaving_time, getattr(h, "leaving_time", 60)) - max(self.start_time, getattr(h, "start_time", 60))
-            t_near = self.rng.random() * t_overlap
-            # if self.rng.random() < 0.001:
-                # import pdb; pdb.set_trace()
-                # print("distance", distance, "time", t_near)
-            contact_condition = distance <= INFECTION_RADIUS and t_near > INFECTION_DURATION
-            if contact_condition:
-                proximity_factor = (1 - distance/INFECTION_RADIUS) + min((t_near - INFECTION_DURATION)/INFECTION_DURATION, 1)
-
-                infectee = None
-                if self.is_infectious:
-                    ratio = self.asymptomatic_infection_ratio  if self.is_asymptomatic else 1.0
-                    p_infection = self.infectiousness * ratio
-                    x_human = self.rng.random() < p_infection * CONTAGION_KNOB
-
-                    if x_human and h.is_susceptible:
-                        h.infection_timestamp = self.env.timestamp
-                        self.n_infectious_contacts+=1
-                        Event.log_exposed(h, self, self.env.timestamp)
-                        city.tracker.track_infection('human', from_human=self, to_human=h, location=location, timestamp=self.env.timestamp)
-                        # this was necessary because the side-simulation needs to know about the infection time
-                        h.historical_infection_timestamp = self.env.timestamp
-                        # print(f"{self.name} infected {h.name} at {location}")
-                        infectee = h.name
-
-                elif h.is_infectious:
-                    ratio = h.asymptomatic_infection_ratio  if h.is_asymptomatic else 1.0
-                    p_infection = h.infectiousness * ratio # &prob_infectious
-                    x_human = self.rng.random() < p_infection * CONTAGION_KNOB
-
-                    if x_human and self.is_susceptible:
-                        self.infection_timestamp = self.env.timestamp
-                        h.n_infectious_contacts+=1
-                        Event.log_exposed(self, h, self.env.timestamp)
-                        city.tracker.track_infection('human', from_human=h, to_human=self, location=location, timestamp=self.env.timestamp)
-                        # this was necessary because the side-simulation needs to know about the infection time
-                        self.historical_infection_timestamp = self.env.timestamp
-                        # print(f"{h.name} infected {self.name} at {location}")
-                        infectee = self.name
-
-                city.tracker.track_encounter_events(human1=self, human2=h, location=location, distance=distance, duration=t_near)
-                Event.log_encounter(self, h,
-                                    location=location,
-                                    duration=t_near,
-                                    distance=distance,
-                                    infectee=infectee,
-                                    time=self.env.timestamp
-                                    )
+        yield self.env.timeout(duration / TICK_MINUTE)
+
+        if DEPARTURE_TIME_ENCOUNTERS:
+            self._resolve_departure(location, city)
+        hours = None
+        if EVENT_DRIVEN_SCHEDULER and location == self.household:
+            # a stay at home stands for as many hourly stays: an infectious human re-entered every hour,
+            # and each hour is an exposure to the surfaces
+            hours = duration / 60
+            if self.is_infectious:
+                location.contaminate(math.ceil(hours))
+        self._environmental_transmission(location, city, hours)
+        location.remove_human(self)
 
+    def stay_home(self, city, duration):
+        """
+        Spends `duration` minutes at home as part of a single household stay (COALESCE_HOME_STAYS).
+        The stay starts at the first call and lasts until `leave_home`, so that consecutive hours
+        at home neither re-enter the household nor re-run the encounters with co-residents.
+        """
+        if self not in self.household.humans:
+            city.tracker.track_trip(from_location=self.location.location_type, to_location=self.household.location_type, age=self.age, hour=self.env.hour_of_day())
+            self.location = self.household
+            self.household.add_human(self)
+            self.start_time = self.env.now
         yield self.env.timeout(duration / TICK_MINUTE)
 
-        # environmental transmission
-        x_environment = location.contamination_probability > 0 and self.rng.random() < ENVIRONMENTAL_INFECTION_KNOB * location.contamination_probability # &prob_infection
+    def leave_home(self, city):
+        """
+        Ends the current household stay. The contacts with the co-residents are resolved once,
+        with the exact time spent together, and the environmental exposure covers every hour of the stay.
+        """
+        household = self.household
+        if self not in household.humans:
+            return
+
+        self._resolve_departure(household, city)
+        hours = (self.env.now - household.arrival_ticks[self]) * TICK_MINUTE / 60
+        self._environmental_transmission(household, city, hours)
+        household.remove_human(self)
+
+    def _resolve_departure(self, location, city):
+        """
+        Resolves the contacts of this human with the occupants still at `location` as it leaves.
+        Each pair is resolved once, when the earlier of the two leaves, with the exact time
+        they spent together since the later arrival.
+        """
+        others, distance, track_pairs = self._encounter_candidates(location, city, departing=True)
+        if others:
+            self._resolve_encounters(others, location, city, self._overlaps(others, location, departing=True), track_pairs, distance)
+
+    def _overlaps(self, others, location, departing=False):
+        """
+        Time (minutes) spent by this human with each of the `others` occupants of `location`: until
+        the earlier of the two leaves, or until now when `departing` (since the later arrival).
+        """
+        if departing:
+            arrival = location.arrival_ticks[self]
+            return np.array([self.env.now - max(arrival, location.arrival_ticks[h]) for h in others]) * TICK_MINUTE
+        leaving_time = np.fromiter((getattr(h, "leaving_time", 60) for h in others), dtype=float, count=len(others))
+        start_time = np.fromiter((getattr(h, "start_time", 60) for h in others), dtype=float, count=len(others))
+        return np.minimum(self.leaving_time, leaving_time) - np.maximum(self.start_time, start_time)
+
+    def _encounter_candidates(self, location, city, departing=False):
+        """
+        Returns the occupants of `location` to resolve encounters with, their distances if they
+        were drawn by the contact model of the location (None otherwise), and whether pairs are
+        tracked one by one. When `departing`, the occupants that were not with this human for
+        longer than INFECTION_DURATION are left out, as they cannot be in contact.
+        """
+        track_pairs = True
+        if INFECTION_ONLY_ENCOUNTERS and not COLLECT_LOGS:
+            # only pairs made of an infectious and a susceptible human can change the epidemic
+            if self.is_infectious:
+                others = [h for h in location.susceptible_humans if h is not self]
+            elif self.is_susceptible:
+                others = location.infectious_humans
+            else:
+                others = []
+            # the contacts are counted, not resolved, with the law of the exact path
+            occupants = [h for h in location.humans if h is not self]
+            if occupants:
+                n_contacts = location.n_contacts(self._overlaps(occupants, location, departing), self.rng)
+                city.tracker.track_encounter_counts(self, location, n_contacts)
+            track_pairs = False
+        else:
+            others = [h for h in location.humans if h is not self]
+
+        if departing and others:
+            since = self.env.now - INFECTION_DURATION / TICK_MINUTE
+            if location.arrival_ticks[self] >= since:
+                others = []
+            else:
+                others = [h for h in others if location.arrival_ticks[h] < since]
+
+        distance = None
+        if CONTACT_SAMPLING and location.location_type in CONTACT_SAMPLING_LOCATION_TYPES and others:
+            others, distance = location.sample_contacts(others, self.rng)
+        return others, distance, track_pairs
+
+    def _environmental_transmission(self, location, city, hours=None):
+        """ Infection from the contaminated surfaces of `location`; `hours` counts one exposure per hour spent there """
+        p_infection = ENVIRONMENTAL_INFECTION_KNOB * location.contamination_probability # &prob_infection
+        if hours is not None:
+            p_infection = 1 - (1 - p_infection) ** hours
+        x_environment = location.contamination_probability > 0 and self.rng.random() < p_infection
         if x_environment and self.is_susceptible:
             self.infection_timestamp = self.env.timestamp
             Event.log_exposed(self, location,  self.env.timestamp)
@@ -606,8 +826,78 @@ class Human(object):
             self.historical_infection_timestamp = self.env.timestamp
             # print(f"{self.name} is enfected at {location}")
 
-        location.remove_human(self)
+    def _resolve_encounters(self, others, location, city, t_overlap, track_pairs=True, distance=None):
+        """
+        Draws the encounters of this human with the `others` occupants of `location` in one batch,
+        given the time `t_overlap` spent with each of them. Distances (unless given), contact
+        conditions and infection draws are computed as arrays over all occupants; infections,
+        tracker updates and events are then emitted for the pairs in contact, in occupancy order.
+        With `track_pairs=False` only infections are reported.
+        """
+        n = len(others)
+        n_contacts = None
+        if EVENT_DRIVEN_SCHEDULER and location == self.household:
+            # a stay at home stands for the hourly stays of the hourly loop, with a contact draw per hour
+            distance, t_near, n_contacts = location.hourly_contacts(t_overlap, self.rng)
+            contacts = np.flatnonzero(n_contacts)
+        else:
+            if distance is None:
+                distance = location.encounter_distances(n, self.rng)
+            t_near = self.rng.random_sample(n) * t_overlap
+            contacts = np.flatnonzero((distance <= INFECTION_RADIUS) & (t_near > INFECTION_DURATION))
+        if len(contacts) == 0:
+            return
+
+        # transmission can only go from the infectious human of each pair
+        self_is_infectious = self.is_infectious
+        if self_is_infectious:
+            ratio = self.asymptomatic_infection_ratio if self.is_asymptomatic else 1.0
+            p_infection = self.infectiousness * ratio
+        else:
+            p_infection = np.zeros(len(contacts))
+            for i, j in enumerate(contacts):
+                h = others[j]
+                if h.is_infectious:
+                    ratio = h.asymptomatic_infection_ratio if h.is_asymptomatic else 1.0
+                    p_infection[i] = h.infectiousness * ratio # &prob_infectious
+        p_transmission = p_infection * CONTAGION_KNOB
+        if n_contacts is not None:
+            # any of the hourly contacts of a pair can transmit
+            p_transmission = 1 - (1 - p_transmission) ** n_contacts[contacts]
+        x_human = self.rng.random_sample(len(contacts)) < p_transmission
+
+        for i, j in enumerate(contacts):
+            h = others[j]
+            infectee = None
+            if x_human[i] and self_is_infectious and h.is_susceptible:
+                h.infection_timestamp = self.env.timestamp
+                self.n_infectious_contacts+=1
+                Event.log_exposed(h, self, self.env.timestamp)
+                city.tracker.track_infection('human', from_human=self, to_human=h, location=location, timestamp=self.env.timestamp)
+                # this was necessary because the side-simulation needs to know about the infection time
+                h.historical_infection_timestamp = self.env.timestamp
+                infectee = h.name
+
+            elif x_human[i] and not self_is_infectious and self.is_susceptible:
+                self.infection_timestamp = self.env.timestamp
+                h.n_infectious_contacts+=1
+                Event.log_exposed(self, h, self.env.timestamp)
+                city.tracker.track_infection('human', from_human=h, to_human=self, location=location, timestamp=self.env.timestamp)
+                # this was necessary because the side-simulation needs to know about the infection time
+                self.historical_infection_timestamp = self.env.timestamp
+                infectee = self.name
+
+            if not track_pairs:
+                continue
 
+            city.tracker.track_encounter_events(human1=self, human2=h, location=location, distance=float(distance[j]), duration=float(t_near[j]))
+            Event.log_encounter(self, h,
+                                location=location,
+                                duration=float(t_near[j]),
+                                distance=float(distance[j]),
+                                infectee=infectee,
+                                time=self.env.timestamp
+                                )
 
     def _select_location(self, location_type, city):
         """
@@ -619,6 +909,7 @@ class Human(object):
             S = self.visits.n_parks
             self.adjust_gamma = 1.0
             pool_pref = self.parks_preferences
+            preferred = self.population.parks_preferred
             locs = city.parks
             visited_locs = self.visits.parks
 
@@ -626,29 +917,19 @@ class Human(object):
             S = self.visits.n_stores
             self.adjust_gamma = 1.0
             pool_pref = self.stores_preferences
+            preferred = self.population.stores_preferred
             locs = city.stores
             visited_locs = self.visits.stores
 
         elif location_type == "hospital":
-            hospital = None
-            for hospital in sorted(city.hospitals, key=lambda x:compute_distance(self.location, x)):
-                if len(hospital.humans) < hospital.capacity:
-                    return hospital
-            return None
+            return city.hospital_index.nearest(self.location)
 
         elif location_type == "hospital-icu":
-            icu = None
-            for hospital in sorted(city.hospitals, key=lambda x:compute_distance(self.location, x)):
-                if len(hospital.icu.humans) < hospital.icu.capacity:
-                    return hospital.icu
-            return None
+            return city.hospital_index.nearest(self.location, icu=True)
 
         elif location_type == "miscs":
             S = self.visits.n_miscs
             self.adjust_gamma = 1.0
-            pool_pref = [(compute_distance(self.location, m) + 1e-1) ** -1 for m in city.miscs if
-                         m != self.location]
-            pool_locs = [m for m in city.miscs if m != self.location]
             locs = city.miscs
             visited_locs = self.visits.miscs
 
@@ -662,14 +943,26 @@ class Human(object):
 
         if self.rng.random() < p_exp and S != len(locs):
             # explore
-            cands = [i for i in locs if i not in visited_locs]
-            cands = [(loc, pool_pref[i]) for i, loc in enumerate(cands)]
-        else:
-            # exploit
-            cands = [(i, count) for i, count in visited_locs.items()]
-
-        cands, scores = zip(*cands)
-        loc = self.rng.choice(cands, p=_normalize_scores(scores))
+            if location_type == "miscs":
+                # drawn from the precomputed preferences of the current location
+                i = city.misc_sampler(self.location).sample(self.rng, excluded=[city.misc_index[m] for m in visited_locs])
+            else:
+                # drawn from the preferences for the places not visited yet
+                sampler = self.visits.samplers.get(location_type)
+                if sampler is None:
+                    sampler = self.visits.samplers[location_type] = FenwickSampler(pool_pref)
+                i = sampler.sample(self.rng)
+                if i is not None:
+                    sampler.update(i, 0)
+                    i = i if preferred is None else preferred[self.idx, i]
+            if i is not None:
+                loc = locs[i]
+                visited_locs[loc] += 1
+                return loc
+
+        # exploit
+        cands, scores = zip(*visited_locs.items())
+        loc = cands[choice_index(self.rng, scores)]
         visited_locs[loc] += 1
         return loc
 
@@ -677,7 +970,6 @@ class Human(object):
         """This function serializes the human object for pickle."""
         # TODO: I deleted many unserializable attributes, but many of them can (and should) be converted to serializable form.
         del self.env
-        del self._events
         del self.rng
         del self.visits
         del self.leaving_time
@@ -685,14 +977,11 @@ class Human(object):
         del self.household
         del self.location
         del self.workplace
-        del self.viral_load_plateau_start
-        del self.viral_load_plateau_end
-        del self.viral_load_recovered
         del self.exercise_hours
         del self.exercise_days
         del self.shopping_days
         del self.shopping_hours
         del self.work_start_hour
-        del self.infection_timestamp
-        del self.recovered_timestamp
+        del self._infection_timestamp
+        del self._recovered_timestamp
         return self
@@ -0,0 +1,104 @@
+import datetime
+import os
+import unittest
+from tempfile import TemporaryDirectory
+
+import numpy as np
+
+from archive import ALIGNMENT, ARRAYS, ArchiveReader, append_chunk, sort_archive
+
+
+class ArchiveTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'data.archive')
+        rng = np.random.RandomState(0)
+        start = datetime.datetime(2020, 2, 28)
+        self.events = [{
+            'human_id': f"human:{rng.randint(100)}",
+            'event_type': ['test', 'symptom_start', 'recovered'][rng.randint(3)],
+            'time': start + datetime.timedelta(minutes=10 * i),
+            'payload': {'observed': {}, 'unobserved': {'i': i}},
+        } for i in range(1000)]
+        self.chunks = [self.events[i:i + 150] for i in range(0, len(self.events), 150)]
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_query(self):
+        """
+        A query reads the chunks its events can be in, and yields those events in order
+        """
+        for chunk in self.chunks:
+            append_chunk(self.path, chunk)
+        reader = ArchiveReader(self.path)
+        self.assertEqual(len(reader.index), len(self.chunks))
+        self.assertEqual(len(reader), len(self.events))
+        self.assertEqual(list(reader.events()), self.events)
+
+        start, end = self.events[200]['time'], self.events[420]['time']
+        self.assertEqual(len(reader.select(start, end)), 2)
+        self.assertEqual(list(reader.events(start, end)), self.events[200:421])
+
+        human_ids, event_types = ['human:3', 'human:42'], ['test']
+        expected = [e for e in self.events if e['human_id'] in human_ids and e['event_type'] in event_types]
+        self.assertEqual(list(reader.events(human_ids=human_ids, event_types=event_types)), expected)
+
+    def test_interrupted_write(self):
+        """
+        The chunks written before an interrupted write are read by scanning the archive, which can be appended to again
+        """
+        for chunk in self.chunks[:-1]:
+            append_chunk(self.path, chunk)
+        with open(self.path, 'r+b') as f:
+            f.truncate(os.path.getsize(self.path) - 10)
+
+        self.assertEqual(list(ArchiveReader(self.path).events()), self.events[:-len(self.chunks[-1])])
+        append_chunk(self.path, self.chunks[-1])
+        self.assertEqual(list(ArchiveReader(self.path).events()), self.events)
+
+    def test_sort(self):
+        """
+        Sorted by human, the chunks of a human span few ids
+        """
+        for chunk in self.chunks:
+            append_chunk(self.path, chunk)
+        dest = os.path.join(self.dir.name, 'sorted.archive')
+        sort_archive(self.path, dest, chunk_size=100)
+
+        reader = ArchiveReader(dest)
+        self.assertEqual(len(reader.index), 10)
+        self.assertEqual(len(reader.select(human_ids=['human:42'])), 1)
+        key = lambda e: (e['human_id'], e['time'])
+        self.assertEqual(sorted(reader.events(), key=key), sorted(self.events, key=key))
+        self.assertEqual(list(reader.events(human_ids=['human:42'])),
+                         [e for e in self.events if e['human_id'] == 'human:42'])
+
+    def test_memory_mapped_columns(self):
+        """
+        Uncompressed columns are read as aligned, read-only views of the mapped archive
+        """
+        rng = np.random.RandomState(0)
+        columns = {
+            'human1_id': rng.randint(100, size=501),
+            'human2_id': rng.randint(100, size=501).astype(np.int16),
+            'time': np.datetime64('2020-02-28') + np.arange(501).astype('timedelta64[m]'),
+            'distance': rng.rand(501),
+            'chunk': np.array(3),
+        }
+        append_chunk(self.path, self.chunks[0])
+        append_chunk(self.path, columns, uncompressed=True)
+
+        reader = ArchiveReader(self.path)
+        entry = reader.index[-1]
+        self.assertEqual(entry['format'], ARRAYS)
+        chunk = reader.read(entry)
+        self.assertEqual(list(chunk), list(columns))
+        for name, column in columns.items():
+            self.assertEqual(chunk[name].dtype, column.dtype)
+            self.assertTrue(np.array_equal(chunk[name], column))
+            self.assertFalse(chunk[name].flags.writeable)
+            self.assertEqual((entry['offset'] + entry['columns'][name]['offset']) % ALIGNMENT, 0)
+            self.assertTrue(np.shares_memory(chunk[name], reader._map))
+        self.assertEqual([list(c) for c in reader.columns()], [list(columns)])
@@ -0,0 +1,61 @@
+import datetime
+import os
+import unittest
+from tempfile import TemporaryDirectory
+
+import numpy as np
+
+import config
+from city_cache import city_key
+from run import run_simu
+from simulator import Human
+
+
+class CityCacheTest(unittest.TestCase):
+
+    def run_simu(self):
+        monitors, tracker = run_simu(
+            n_people=50,
+            init_percent_sick=0.1,
+            start_time=datetime.datetime(2020, 2, 28, 0, 0),
+            simulation_days=5,
+            outfile=None,
+            seed=0
+        )
+        return monitors[1].data, tracker.n_contacts
+
+    def test_cached_run(self):
+        """
+        A run on a cached city is the same as a run on a freshly built one
+        """
+        with TemporaryDirectory() as d:
+            config.CITY_CACHE_DIR = d
+            try:
+                built = self.run_simu()
+                self.assertEqual(len(os.listdir(d)), 1)
+                cached = self.run_simu()
+            finally:
+                config.CITY_CACHE_DIR = None
+        self.assertEqual(built, cached)
+
+    def test_key(self):
+        """
+        The cached cities are invalidated by the parameters of the city and by the config
+        """
+        start_time = datetime.datetime(2020, 2, 28, 0, 0)
+        def key(n_people=50, seed=0):
+            return city_key(n_people, np.random.RandomState(seed), (0, 1000), (0, 1000), start_time, 0.1, Human, 5)
+
+        self.assertEqual(key(), key())
+        self.assertNotEqual(key(), key(n_people=60))
+        self.assertNotEqual(key(), key(seed=1))
+
+        k = key()
+        for name, value in [('P_COLD', config.P_COLD + 0.1), ('INFECTIOUSNESS_ONSET_DAYS', config.INFECTIOUSNESS_ONSET_DAYS + 1),
+                            ('DEFERRED_ENCOUNTER_PAYLOAD', not config.DEFERRED_ENCOUNTER_PAYLOAD)]:
+            default = getattr(config, name)
+            setattr(config, name, value)
+            try:
+                self.assertNotEqual(k, key())
+            finally:
+                setattr(config, name, default)
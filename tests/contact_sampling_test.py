@@ -0,0 +1,75 @@
+import datetime
+import unittest
+
+import numpy as np
+from orderedset import OrderedSet
+from scipy.stats import ks_2samp
+
+from base import Env, Location
+from config import INFECTION_RADIUS, LOCATION_DISTRIBUTION
+
+
+class ContactSamplingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.rng = np.random.RandomState(0)
+        specs = LOCATION_DISTRIBUTION['school']
+        self.location = Location(
+            env=Env(datetime.datetime(2020, 2, 28, 0, 0)),
+            rng=self.rng,
+            area=40000,
+            name="school:0",
+            location_type="school",
+            lat=0,
+            lon=0,
+            social_contact_factor=specs['social_contact_factor'],
+            capacity=None,
+            surface_prob=specs['surface_prob'],
+        )
+
+    def occupy(self, n):
+        # the contact models only depend on the occupancy of the location
+        self.location.humans = OrderedSet(range(n + 1))
+        return list(range(n))
+
+    def test_equivalent_to_all_pairs(self):
+        """
+        Below the contact bound, the sampled contacts follow the same law as the contacts
+        within INFECTION_RADIUS of the exact all-pairs draw
+        """
+        others = self.occupy(20)
+        n_trials = 2000
+
+        exact_counts, exact_distances = [], []
+        sampled_counts, sampled_distances, sampled_idx = [], [], []
+        for _ in range(n_trials):
+            distance = self.location.encounter_distances(len(others), self.rng)
+            close = distance[distance <= INFECTION_RADIUS]
+            exact_counts.append(len(close))
+            exact_distances.extend(close)
+
+            contacts, distance = self.location.sample_contacts(others, self.rng)
+            self.assertTrue(all(distance <= INFECTION_RADIUS))
+            self.assertEqual(contacts, sorted(contacts))
+            sampled_counts.append(len(contacts))
+            sampled_distances.extend(distance)
+            sampled_idx.extend(contacts)
+
+        self.assertLess(max(sampled_counts), self.location.max_contacts)
+        stderr = np.std(exact_counts) * np.sqrt(2 / n_trials)
+        self.assertLess(abs(np.mean(exact_counts) - np.mean(sampled_counts)), 4 * stderr)
+        self.assertAlmostEqual(np.var(exact_counts), np.var(sampled_counts), delta=0.15 * np.var(exact_counts))
+        self.assertGreater(ks_2samp(exact_distances, sampled_distances).pvalue, 0.001)
+
+        # every occupant is equally likely to be a contact
+        self.assertAlmostEqual(np.mean(sampled_idx), (len(others) - 1) / 2, delta=0.5)
+
+    def test_bounded_contacts(self):
+        """
+        The number of contacts per visit does not grow with the occupancy
+        """
+        others = self.occupy(5000)
+        for _ in range(100):
+            contacts, distance = self.location.sample_contacts(others, self.rng)
+            self.assertLessEqual(len(contacts), self.location.max_contacts)
+            self.assertEqual(len(contacts), len(distance))
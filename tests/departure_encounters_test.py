@@ -0,0 +1,58 @@
+import datetime
+import unittest
+from unittest import mock
+
+import simulator
+from config import INFECTION_DURATION, TICK_MINUTE
+from run import run_simu
+from simulator import Human
+
+
+class DepartureTimeEncountersTest(unittest.TestCase):
+
+    def setUp(self):
+        simulator.DEPARTURE_TIME_ENCOUNTERS = True
+
+    def tearDown(self):
+        simulator.DEPARTURE_TIME_ENCOUNTERS = False
+
+    def test_departures(self):
+        """
+        Each pair is resolved once, when the earlier of the two leaves, with the time since the later
+        arrival; the pairs that were not together for longer than INFECTION_DURATION are left out
+        """
+        resolve_departure, resolve_encounters = Human._resolve_departure, Human._resolve_encounters
+        resolved, pairs = [], set()
+
+        def record_encounters(human, others, location, city, t_overlap, *args):
+            resolved.append((others, t_overlap))
+            resolve_encounters(human, others, location, city, t_overlap, *args)
+
+        def check_departure(human, location, city):
+            now, arrival = human.env.now, location.arrival_ticks[human]
+            arrivals = {h: max(arrival, location.arrival_ticks[h]) for h in location.humans if h is not human}
+            expected = {h: (now - t) * TICK_MINUTE for h, t in arrivals.items() if (now - t) * TICK_MINUTE > INFECTION_DURATION}
+
+            del resolved[:]
+            resolve_departure(human, location, city)
+            others, t_overlap = resolved[0] if resolved else ([], [])
+            self.assertLessEqual(len(resolved), 1)
+            self.assertEqual(set(others), set(expected))
+            for h, t in zip(others, t_overlap):
+                self.assertAlmostEqual(t, expected[h])
+                pair = (frozenset([human, h]), location, arrivals[h])
+                self.assertNotIn(pair, pairs)
+                pairs.add(pair)
+
+        with mock.patch.object(Human, '_resolve_departure', check_departure), \
+                mock.patch.object(Human, '_resolve_encounters', record_encounters):
+            _, tracker = run_simu(
+                n_people=100,
+                init_percent_sick=0.1,
+                start_time=datetime.datetime(2020, 2, 28, 0, 0),
+                simulation_days=3,
+                outfile=None,
+                seed=0
+            )
+        self.assertGreater(len(pairs), 1000)
+        self.assertGreater(tracker.n_contacts, 0)
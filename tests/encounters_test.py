@@ -0,0 +1,126 @@
+import datetime
+import unittest
+from tempfile import NamedTemporaryFile
+from unittest import mock
+
+import config
+config.COLLECT_LOGS = True
+import base
+import monitors
+import simulator
+from base import Event
+from archive import ARRAYS, COLUMNS, EVENTS, ArchiveReader
+from encounters import EncounterLog, _decode_column, iter_encounter_events
+from run import run_simu
+
+
+class ColumnarEncountersTest(unittest.TestCase):
+
+    def setUp(self):
+        self.event = simulator.Event
+        simulator.Event = Event
+
+    def tearDown(self):
+        simulator.Event = self.event
+        base.COLUMNAR_ENCOUNTERS = False
+        base.DEFERRED_ENCOUNTER_PAYLOAD = False
+        monitors.UNCOMPRESSED_COLUMNS = False
+
+    def run_simu(self, columnar, deferred=False, uncompressed=False):
+        """ Events of the pickled chunks, and the encounters of the column chunks """
+        base.COLUMNAR_ENCOUNTERS = columnar
+        base.DEFERRED_ENCOUNTER_PAYLOAD = deferred
+        monitors.UNCOMPRESSED_COLUMNS = uncompressed
+        with NamedTemporaryFile() as f:
+            simu_monitors, _ = run_simu(
+                n_people=50,
+                init_percent_sick=0.2,
+                start_time=datetime.datetime(2020, 2, 28, 0, 0),
+                simulation_days=6,
+                outfile=f.name,
+                out_chunk_size=200,
+                seed=0
+            )
+            simu_monitors[0].dump()
+            simu_monitors[0].join_iothread()
+
+            reader = ArchiveReader(f"{f.name}.archive")
+            events, encounters = [], []
+            for entry in reader.index:
+                if entry['format'] in [COLUMNS, ARRAYS]:
+                    encounters.extend(iter_encounter_events(reader.read(entry), reader.courses))
+                elif entry['format'] == EVENTS:
+                    events.extend(reader.read(entry))
+            return events, encounters
+
+    def test_same_events(self):
+        """
+        The events read back from the column chunks are the ones logged as dicts
+        """
+        events, _ = self.run_simu(columnar=False)
+        columnar_events, columnar_encounters = self.run_simu(columnar=True)
+
+        encounters = [e for e in events if e['event_type'] == Event.encounter]
+        self.assertGreater(len(encounters), 0)
+        self.assertTrue(any(e['payload']['unobserved']['human1']['got_exposed'] for e in encounters))
+        self.assertEqual(len(encounters), len(columnar_encounters))
+        for encounter, columnar_encounter in zip(encounters, columnar_encounters):
+            self.assertEqual(encounter, columnar_encounter)
+        self.assertEqual([e for e in events if e['event_type'] != Event.encounter], columnar_events)
+
+    def test_many_strings(self):
+        """
+        The codes of the list values are not truncated when the strings outnumber int16
+        """
+        log = EncounterLog()
+        for i in range(40000):
+            log._encode(f"household:{i}", 'str')
+        symptoms = [None, [], ['cough', 'fever'], ['household:39999', 'cough']]
+        log.rows['human1_symptoms'] = [log._encode(x, 'list') for x in symptoms]
+        columns = log._columns()
+        self.assertEqual(_decode_column(columns, 'human1_symptoms', 'list', columns['strings']), symptoms)
+
+    def test_deferred(self):
+        """
+        The fields recomputed from the facts of the deferred rows are the ones logged when the encounters happen,
+        but for the noise of the observed coordinates
+        """
+        append = EncounterLog.append
+
+        def append_and_log(log, *args):
+            # also log the encounter as dicts, in the same run
+            append(log, *args)
+            base.COLUMNAR_ENCOUNTERS = False
+            Event.log_encounter(*args)
+            base.COLUMNAR_ENCOUNTERS = True
+
+        with mock.patch.object(EncounterLog, 'append', append_and_log):
+            events, deferred_encounters = self.run_simu(columnar=True, deferred=True)
+
+        def without_obs_coordinates(event):
+            # the dicts of the humans are shared between the payloads of both events of an encounter
+            payloads = event['payload'].values()
+            for human in [p[key] for p in payloads for key in ['human1', 'human2'] if key in p]:
+                human.pop('obs_lat', None)
+                human.pop('obs_lon', None)
+            return event
+
+        encounters = [without_obs_coordinates(e) for e in events if e['event_type'] == Event.encounter]
+        self.assertGreater(len(encounters), 0)
+        self.assertTrue(any(e['payload']['unobserved']['human1']['is_infectious'] for e in encounters))
+        self.assertEqual(len(encounters), len(deferred_encounters))
+        for encounter, deferred_encounter in zip(encounters, deferred_encounters):
+            self.assertEqual(encounter, without_obs_coordinates(deferred_encounter))
+
+    def test_uncompressed(self):
+        """
+        The encounters read from the memory-mapped columns are the ones read from the compressed columns
+        """
+        events, encounters = self.run_simu(columnar=True, deferred=True)
+        mapped_events, mapped_encounters = self.run_simu(columnar=True, deferred=True, uncompressed=True)
+
+        self.assertGreater(len(encounters), 0)
+        self.assertEqual(len(encounters), len(mapped_encounters))
+        for encounter, mapped_encounter in zip(encounters, mapped_encounters):
+            self.assertEqual(encounter, mapped_encounter)
+        self.assertEqual(events, mapped_events)
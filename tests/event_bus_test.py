@@ -0,0 +1,38 @@
+import unittest
+
+from base import EventBus
+
+
+class EventBusTest(unittest.TestCase):
+
+    def test_chunks(self):
+        """
+        Events are cut in chunks of `chunk_size` which are handed over without copy
+        """
+        bus = EventBus(chunk_size=3)
+        for i in range(8):
+            bus.append(i)
+        self.assertEqual(len(bus), 8)
+        self.assertEqual(bus.n_chunks, 2)
+        self.assertEqual(bus.pending, list(range(8)))
+
+        self.assertEqual(bus.pop_chunk(), [0, 1, 2])
+        self.assertEqual(bus.pop_chunk(), [3, 4, 5])
+        self.assertEqual(len(bus), 2)
+        self.assertEqual(bus.n_chunks, 0)
+
+        bus.append(8)
+        bus.append(9)
+        self.assertEqual(bus.n_chunks, 1)
+        self.assertEqual(bus.pull(), [6, 7, 8, 9])
+        self.assertEqual(len(bus), 0)
+
+    def test_unbounded(self):
+        """
+        Without `chunk_size` every event stays in the current chunk
+        """
+        bus = EventBus()
+        for i in range(100):
+            bus.append(i)
+        self.assertEqual(bus.n_chunks, 0)
+        self.assertEqual(bus.current, list(range(100)))
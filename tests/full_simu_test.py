@@ -1,11 +1,10 @@
 import datetime
 import filecmp
 import hashlib
-import pickle
 import unittest
-import zipfile
 from tempfile import NamedTemporaryFile
 
+from archive import ArchiveReader
 from run import run_simu
 
 
@@ -38,10 +37,7 @@ class FullUnitTest(unittest.TestCase):
             f.seek(0)
 
             # Ensure
-            data = []
-            with zipfile.ZipFile(f"{f.name}.zip", 'r') as zf:
-                for pkl in zf.namelist():
-                    data.extend(pickle.loads(zf.read(pkl)))
+            data = list(ArchiveReader(f"{f.name}.archive").events())
 
             self.assertTrue(len(data) > 0)
 
@@ -93,15 +89,13 @@ class SeedUnitTest(unittest.TestCase):
             f2.seek(0)
 
             md5 = hashlib.md5()
-            with zipfile.ZipFile(f"{f1.name}.zip", 'r') as zf:
-                for pkl in zf.namelist():
-                    md5.update(zf.read(pkl))
+            with open(f"{f1.name}.archive", 'rb') as archive:
+                md5.update(archive.read())
             md5sum1 = md5.hexdigest()
 
             md5 = hashlib.md5()
-            with zipfile.ZipFile(f"{f2.name}.zip", 'r') as zf:
-                for pkl in zf.namelist():
-                    md5.update(zf.read(pkl))
+            with open(f"{f2.name}.archive", 'rb') as archive:
+                md5.update(archive.read())
             md5sum2 = md5.hexdigest()
 
             self.assertTrue(md5sum1 == md5sum2,
@@ -141,15 +135,13 @@ class SeedUnitTest(unittest.TestCase):
             f2.seek(0)
 
             md5 = hashlib.md5()
-            with zipfile.ZipFile(f"{f1.name}.zip", 'r') as zf:
-                for pkl in zf.namelist():
-                    md5.update(zf.read(pkl))
+            with open(f"{f1.name}.archive", 'rb') as archive:
+                md5.update(archive.read())
             md5sum1 = md5.hexdigest()
 
             md5 = hashlib.md5()
-            with zipfile.ZipFile(f"{f2.name}.zip", 'r') as zf:
-                for pkl in zf.namelist():
-                    md5.update(zf.read(pkl))
+            with open(f"{f2.name}.archive", 'rb') as archive:
+                md5.update(archive.read())
             md5sum2 = md5.hexdigest()
 
             self.assertFalse(md5sum1 == md5sum2,
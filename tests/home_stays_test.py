@@ -0,0 +1,91 @@
+import collections
+import datetime
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+
+import base
+import simulator
+from config import ENVIRONMENTAL_INFECTION_KNOB
+from run import run_simu
+from simulator import Human
+
+RESIDENCES = ['household', 'senior_residency']
+
+
+class CoalescedHomeStaysTest(unittest.TestCase):
+
+    def setUp(self):
+        self.event = simulator.Event
+        simulator.Event = base.Event
+
+    def tearDown(self):
+        simulator.Event = self.event
+        simulator.COALESCE_HOME_STAYS = False
+
+    def test_environmental_exposure(self):
+        """
+        The exposure over a stay of some hours is the one of as many hourly exposures: 1 - (1 - p)**hours
+        """
+        p, hours, n_trials = 0.05, 8, 20000
+        location = SimpleNamespace(contamination_probability=p / ENVIRONMENTAL_INFECTION_KNOB)
+        rng = np.random.RandomState(0)
+
+        def n_infected(stay):
+            city = SimpleNamespace(tracker=mock.Mock())
+            human = SimpleNamespace(rng=rng, is_susceptible=True, env=SimpleNamespace(timestamp=None))
+            with mock.patch.object(simulator, 'Event'):
+                for _ in range(n_trials):
+                    stay(human, city)
+            return city.tracker.track_infection.call_count
+
+        def hourly_stay(human, city):
+            calls = city.tracker.track_infection.call_count
+            for _ in range(hours):
+                if city.tracker.track_infection.call_count == calls:
+                    Human._environmental_transmission(human, location, city)
+
+        expected = 1 - (1 - p) ** hours
+        stderr = np.sqrt(expected * (1 - expected) / n_trials)
+        coalesced = n_infected(lambda human, city: Human._environmental_transmission(human, location, city, hours))
+        self.assertAlmostEqual(coalesced / n_trials, expected, delta=4 * stderr)
+        self.assertAlmostEqual(n_infected(hourly_stay) / n_trials, expected, delta=4 * stderr)
+
+    def run_simu(self, coalesce):
+        simulator.COALESCE_HOME_STAYS = coalesce
+        _, tracker = run_simu(
+            n_people=200,
+            init_percent_sick=0,
+            start_time=datetime.datetime(2020, 2, 28, 0, 0),
+            simulation_days=5,
+            outfile=None,
+            seed=0
+        )
+        trips = collections.Counter()
+        for bins in tracker.transition_probability.values():
+            for froms in bins.values():
+                for tos in froms.values():
+                    trips.update(tos)
+        events = collections.Counter()
+        for event in tracker.city.events:
+            if event['event_type'] == base.Event.encounter:
+                payload = {**event['payload']['observed'], **event['payload']['unobserved']}
+                events[payload['location_type']] += 1
+        return trips, tracker.location_encounters, events
+
+    def test_outside_home(self):
+        """
+        Away from the residences, the trips, contacts and encounter events are those of the hourly loop;
+        at home, the contacts of a stay are resolved once instead of every hour
+        """
+        hourly, coalesced = self.run_simu(False), self.run_simu(True)
+        for hourly_counts, coalesced_counts in zip(hourly, coalesced):
+            outside = [sum(v for k, v in counts.items() if k not in RESIDENCES) for counts in [hourly_counts, coalesced_counts]]
+            self.assertGreater(outside[0], 1000)
+            self.assertAlmostEqual(outside[1] / outside[0], 1, delta=0.1)
+
+            home = [sum(counts[k] for k in RESIDENCES) for counts in [hourly_counts, coalesced_counts]]
+            self.assertGreater(home[1], 0)
+            self.assertLess(home[1], home[0])
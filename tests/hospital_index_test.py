@@ -0,0 +1,31 @@
+import unittest
+from types import SimpleNamespace
+
+import numpy as np
+
+from base import HospitalIndex
+from utils import compute_distance
+
+
+class HospitalIndexTest(unittest.TestCase):
+
+    def test_nearest(self):
+        """
+        The nearest hospital with a free bed is the first one with a free bed in order of distance
+        """
+        rng = np.random.RandomState(0)
+        # a coarse grid, so that many hospitals are at the same distance
+        hospitals = [SimpleNamespace(lat=lat, lon=lon, free_beds=0, icu=SimpleNamespace(free_beds=0))
+                     for lat, lon in rng.randint(0, 10, (60, 2))]
+        index = HospitalIndex(hospitals)
+
+        for _ in range(500):
+            for h in hospitals:
+                h.free_beds = int(rng.rand() < 0.1)
+                h.icu.free_beds = int(rng.rand() < 0.05)
+            location = SimpleNamespace(lat=rng.randint(0, 10), lon=rng.randint(0, 10))
+            ordered = sorted(hospitals, key=lambda x: compute_distance(location, x))
+            for icu in [False, True]:
+                candidates = [h.icu if icu else h for h in ordered]
+                expected = next((h for h in candidates if h.free_beds > 0), None)
+                self.assertIs(index.nearest(location, icu=icu), expected)
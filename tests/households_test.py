@@ -0,0 +1,36 @@
+import unittest
+
+import numpy as np
+
+from base import VacantHouses
+from config import MIN_AVG_HOUSE_AGE
+
+
+class VacantHousesTest(unittest.TestCase):
+
+    def test_first_match(self):
+        """
+        Humans join the same houses as with a scan of the houses in order of creation
+        """
+        rng = np.random.RandomState(0)
+        houses = VacantHouses(1000)
+        residents, vacancies = [], []
+        for _ in range(1000):
+            age = rng.randint(0, 40)
+            expected = None
+            for i, ages in enumerate(residents):
+                if vacancies[i] > 0 and (sum(ages) + age) / (len(ages) + 1) > MIN_AVG_HOUSE_AGE:
+                    expected = i
+                    break
+
+            res = houses.pop_match(age)
+            self.assertEqual(res, expected)
+            if res is None:
+                cap = rng.randint(1, 6)
+                houses.add(len(residents), cap - 1, age_sum=age, n_residents=1)
+                residents.append([age])
+                vacancies.append(cap - 1)
+            else:
+                residents[res].append(age)
+                vacancies[res] -= 1
+            self.assertEqual(len(houses), sum(v > 0 for v in vacancies))
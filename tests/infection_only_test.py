@@ -0,0 +1,35 @@
+import datetime
+import unittest
+
+import simulator
+from run import run_simu
+
+
+class InfectionOnlyEncountersTest(unittest.TestCase):
+
+    def tearDown(self):
+        simulator.INFECTION_ONLY_ENCOUNTERS = False
+
+    def run_simu(self, infection_only):
+        simulator.INFECTION_ONLY_ENCOUNTERS = infection_only
+        _, tracker = run_simu(
+            n_people=200,
+            init_percent_sick=0.1,
+            start_time=datetime.datetime(2020, 2, 28, 0, 0),
+            simulation_days=5,
+            outfile=None,
+            seed=0
+        )
+        return tracker
+
+    def test_contact_totals(self):
+        """
+        The contacts counted without resolving the pairs add up to the contacts of the exact path
+        """
+        exact, counted = self.run_simu(False), self.run_simu(True)
+        self.assertGreater(exact.n_contacts, 10000)
+        self.assertAlmostEqual(counted.n_contacts / exact.n_contacts, 1, delta=0.05)
+        for location_type in ['household', 'senior_residency', 'workplace']:
+            self.assertAlmostEqual(counted.location_encounters[location_type] / exact.location_encounters[location_type], 1, delta=0.1)
+        hourly = [sum(v[1] for v in tracker.hour_encounters.values()) for tracker in [exact, counted]]
+        self.assertAlmostEqual(hourly[1] / hourly[0], 1, delta=0.1)
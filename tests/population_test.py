@@ -0,0 +1,129 @@
+import datetime
+import unittest
+
+import numpy as np
+
+from base import City, Env
+from population import Population
+from simulator import Human
+
+
+class PopulationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.start_time = datetime.datetime(2020, 2, 28, 0, 0)
+        self.env = Env(self.start_time)
+        self.city = City(self.env, 200, np.random.RandomState(0), (0, 1000), (0, 1000), self.start_time, 0.2, Human, 10)
+
+    def test_columns(self):
+        """
+        The attributes of each human are stored in its row of the population
+        """
+        population = self.city.population
+        self.assertEqual(len(population), len(self.city.humans))
+        for idx, h in enumerate(self.city.humans):
+            self.assertIs(h.population, population)
+            self.assertEqual(h.idx, idx)
+            self.assertEqual(h.age, population.age[idx])
+            self.assertEqual(h.carefulness, population.carefulness[idx])
+            self.assertTrue(np.array_equal(h.mask_wearing, population.mask_wearing[idx]))
+
+        h = self.city.humans[0]
+        h.infection_timestamp = None
+        self.assertIsNone(h.infection_tick)
+        self.assertTrue(np.isnan(population.infection_tick[0]))
+        h.infection_timestamp = self.start_time
+        self.assertEqual(h.infection_tick, 0)
+
+        h.n_infectious_contacts += 1
+        self.assertEqual(population.n_infectious_contacts[0], 1)
+
+    def test_seir_counts(self):
+        """
+        The population-wide SEIR counts match the states of the humans
+        """
+        for i, h in enumerate(self.city.humans[::3]):
+            h.infection_timestamp = self.start_time - datetime.timedelta(days=i % 20)
+        for h in self.city.humans[1::10]:
+            h.recovered_timestamp = datetime.datetime.max
+
+        states = np.array([h.state for h in self.city.humans])
+        self.assertEqual(self.city.population.seir_counts(self.env.now), tuple(states.sum(axis=0)))
+
+    def test_standalone_human(self):
+        """
+        A human created outside of a city gets a population of its own
+        """
+        h = Human(env=self.env, name=0, age=30, rng=np.random.RandomState(0), infection_timestamp=None,
+                  household=self.city.households[0], workplace=None, profession='others', sim_days=10)
+        self.assertEqual(len(h.population), 1)
+        self.assertEqual(h.age, 30)
+        self.assertTrue(h.is_susceptible)
+
+    def test_synthesize(self):
+        """
+        The batched draws of the population follow the distributions of the per-human draws
+        """
+        n = 2000
+        rng = np.random.RandomState(0)
+        ages = rng.randint(0, 100, size=n)
+        infected = rng.rand(n) < 0.5
+        household = self.city.households[0]
+
+        population = Population(n, 10)
+        traits = population.synthesize(ages, np.random.RandomState(1))
+        batched = [Human(env=self.env, name=i, age=ages[i], rng=rng, household=household, workplace=None,
+                         profession='others', infection_timestamp=self.start_time if infected[i] else None,
+                         sim_days=10, population=population, idx=i, traits=traits[i]) for i in range(n)]
+        scalar = [Human(env=self.env, name=i, age=ages[i], rng=rng, household=household, workplace=None,
+                        profession='others', infection_timestamp=self.start_time if infected[i] else None,
+                        sim_days=10) for i in range(n)]
+
+        def mean(humans, f):
+            return np.mean([f(h) for h in humans])
+
+        for f, tolerance in [
+            (lambda h: h.sex == 'female', 0.05),
+            (lambda h: len(h.preexisting_conditions), 0.05),
+            (lambda h: h.carefulness, 0.02),
+            (lambda h: np.mean(h.mask_wearing), 0.02),
+            (lambda h: h.has_app, 0.05),
+            (lambda h: h.incubation_days, 0.2),
+            (lambda h: h.gets_really_sick, 0.05),
+            (lambda h: h.is_asymptomatic, 0.05),
+            (lambda h: h.viral_load_plateau_start, 0.1),
+            (lambda h: h.viral_load_recovered, 0.2),
+            (lambda h: len(h.all_symptoms), 0.3),
+            (lambda h: sum(len(x) for x in h.all_symptoms), 1.),
+            (lambda h: sum(len(x) for x in h.all_reported_symptoms), 1.),
+            (lambda h: h.has_logged_info, 0.05),
+            (lambda h: h.avg_working_minutes, 5),
+            (lambda h: len(h.shopping_days), 0.1),
+            (lambda h: np.mean(h.work_start_hour), 0.1),
+        ]:
+            self.assertAlmostEqual(mean(batched, f), mean(scalar, f), delta=tolerance)
+
+    def test_lazy_disease_course(self):
+        """
+        With LAZY_DISEASE_COURSE, the disease course is drawn at infection from the human's own random stream
+        """
+        import simulator
+        simulator.LAZY_DISEASE_COURSE = True
+        try:
+            humans = [Human(env=self.env, name=0, age=60, rng=np.random.RandomState(seed), infection_timestamp=None,
+                            household=self.city.households[0], workplace=None, profession='others', sim_days=10)
+                      for seed in [0, 0]]
+            h1, h2 = humans
+            self.assertIsNone(h1.all_symptoms)
+            self.assertEqual(h1.viral_load_plateau_start, 0)
+
+            h1.infection_timestamp = self.start_time
+            h1.rng.rand(100) # other draws between the two infections do not change the course
+            h2.infection_timestamp = self.start_time + datetime.timedelta(days=3)
+            self.assertIsNotNone(h1.all_symptoms)
+            self.assertGreater(h1.viral_load_plateau_start, 0)
+            self.assertEqual(h1.all_symptoms, h2.all_symptoms)
+            self.assertEqual(h1.all_reported_symptoms, h2.all_reported_symptoms)
+            self.assertEqual(h1.viral_load_recovered, h2.viral_load_recovered)
+        finally:
+            simulator.LAZY_DISEASE_COURSE = False
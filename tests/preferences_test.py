@@ -0,0 +1,31 @@
+import unittest
+from collections import namedtuple
+
+import numpy as np
+
+from utils import compute_preferences
+
+Loc = namedtuple('Loc', ['lat', 'lon'])
+
+
+class PreferencesTest(unittest.TestCase):
+
+    def test_top_k(self):
+        """
+        The top-k preferences are the largest of the full preferences, in decreasing order
+        """
+        rng = np.random.RandomState(0)
+        houses = [Loc(*x) for x in rng.randint(0, 1000, (500, 2))]
+        stores = [Loc(*x) for x in rng.randint(0, 1000, (40, 2))]
+
+        preferred, preferences = compute_preferences(houses, stores)
+        self.assertIsNone(preferred)
+        self.assertEqual(preferences.shape, (500, 40))
+
+        nearest, top = compute_preferences(houses, stores, k=5, chunk_size=64)
+        self.assertEqual(nearest.shape, (500, 5))
+        self.assertTrue(np.allclose(np.take_along_axis(preferences, nearest.astype(int), axis=1), top))
+        self.assertTrue(np.allclose(-np.sort(-preferences, axis=1)[:, :5], top))
+
+        preferred, preferences = compute_preferences(houses, stores, k=40)
+        self.assertIsNone(preferred)
@@ -0,0 +1,141 @@
+import collections
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+from scipy.stats import truncnorm
+
+from base import City
+from samplers import CDFSampler, CategoricalSampler, FenwickSampler, choice_index, sample_distinct
+from utils import _get_integer_pdf, _truncnorm_rvs
+
+
+class CategoricalSamplerTest(unittest.TestCase):
+
+    def test_choice(self):
+        """
+        Draws are the ones `rng.choice` makes with the same probabilities and random stream
+        """
+        irange, normal_pdf = _get_integer_pdf(480, 60)
+        sampler = CategoricalSampler(irange, normal_pdf)
+        rng1, rng2 = np.random.RandomState(0), np.random.RandomState(0)
+        for _ in range(1000):
+            self.assertEqual(sampler.sample(rng1, size=1), rng2.choice(irange, size=1, p=normal_pdf))
+        self.assertTrue(np.array_equal(sampler.sample(rng1, size=100), rng2.choice(irange, size=100, p=normal_pdf)))
+
+        weights = [3, 1, 4, 1, 5]
+        for _ in range(1000):
+            self.assertEqual(choice_index(rng1, weights), rng2.choice(5, p=np.array(weights) / sum(weights)))
+
+
+class SampleDistinctTest(unittest.TestCase):
+
+    def test_uniform(self):
+        """
+        The k indices are distinct and sorted, and every subset of size k is equally likely
+        """
+        rng = np.random.RandomState(0)
+        counts = collections.Counter(tuple(sample_distinct(rng, 5, 2)) for _ in range(20000))
+        self.assertEqual(len(counts), 10)
+        self.assertTrue(all(i < j for i, j in counts))
+        for count in counts.values():
+            self.assertAlmostEqual(count / 20000, 0.1, delta=0.01)
+
+        self.assertEqual(sample_distinct(rng, 7, 7), list(range(7)))
+        self.assertEqual(sample_distinct(rng, 7, 0), [])
+        self.assertEqual(len(sample_distinct(rng, 10 ** 9, 25)), 25)
+
+
+class CDFSamplerTest(unittest.TestCase):
+
+    def test_choice(self):
+        """
+        A draw is the one `rng.choice` makes from the same weights and random stream
+        """
+        weights = np.random.RandomState(0).rand(50)
+        sampler = CDFSampler(weights)
+        rng1, rng2 = np.random.RandomState(1), np.random.RandomState(1)
+        for _ in range(1000):
+            self.assertEqual(sampler.sample(rng1), rng2.choice(50, p=weights / weights.sum()))
+
+    def test_excluded(self):
+        """
+        Excluded indices are never drawn and the others keep their relative weights
+        """
+        weights = np.array([1., 0., 2., 3., 4.])
+        sampler = CDFSampler(weights)
+        rng = np.random.RandomState(0)
+        draws = np.array([sampler.sample(rng, excluded=[3, 0]) for _ in range(20000)])
+        self.assertEqual(set(draws), {2, 4})
+        self.assertAlmostEqual(np.mean(draws == 2), 2 / 6, delta=0.01)
+
+        self.assertIsNone(sampler.sample(rng, excluded=[0, 2, 3, 4]))
+
+
+class FenwickSamplerTest(unittest.TestCase):
+
+    def test_updates(self):
+        """
+        After updates, a draw is the one `rng.choice` makes from the current weights and the same random stream
+        """
+        weights = np.random.RandomState(0).rand(37)
+        sampler = FenwickSampler(weights)
+        rng1, rng2 = np.random.RandomState(1), np.random.RandomState(1)
+        for _ in range(len(weights)):
+            i = sampler.sample(rng1)
+            positive = np.flatnonzero(weights)
+            self.assertEqual(i, rng2.choice(positive, p=weights[positive] / weights[positive].sum()))
+            sampler.update(i, 0)
+            weights[i] = 0
+            self.assertAlmostEqual(sampler.total, weights.sum())
+
+        self.assertIsNone(sampler.sample(rng1))
+        self.assertEqual(sampler.tree.dtype, np.float64)
+        self.assertEqual(sampler.weights.dtype, np.float64)
+        sampler.update(5, 2.)
+        self.assertEqual(sampler.sample(rng1), 5)
+
+
+class Loc(object):
+
+    def __init__(self, lat, lon):
+        self.lat, self.lon = lat, lon
+
+
+class MiscSamplerTest(unittest.TestCase):
+
+    def test_bounded_cache(self):
+        """
+        The samplers of the least recently used origins are dropped, and built again the same
+        """
+        rng = np.random.RandomState(0)
+        miscs = [Loc(lat, lon) for lat, lon in rng.randint(0, 1000, (30, 2))]
+        origins = miscs[:5] + [Loc(lat, lon) for lat, lon in rng.randint(0, 1000, (10, 2))]
+        city = SimpleNamespace(miscs=miscs, misc_samplers=collections.OrderedDict())
+
+        with mock.patch('base.MISC_SAMPLERS_CACHE_SIZE', 4):
+            first = [City.misc_sampler(city, x).cdf for x in origins]
+            self.assertEqual(list(city.misc_samplers), origins[-4:])
+            City.misc_sampler(city, origins[-4])
+            City.misc_sampler(city, origins[0])
+            self.assertEqual(list(city.misc_samplers), origins[-2:] + origins[-4:-3] + origins[:1])
+
+            for x, cdf in zip(origins, first):
+                self.assertTrue(np.array_equal(City.misc_sampler(city, x).cdf, cdf))
+        self.assertEqual(City.misc_sampler(city, miscs[2]).weights[2], 0)
+
+
+class TruncnormTest(unittest.TestCase):
+
+    def test_rvs(self):
+        """
+        Draws are the ones of scipy's truncnorm with the same bounds and random stream
+        """
+        rng = np.random.RandomState(0)
+        a = rng.uniform(-5, 3, 100)
+        b = a + rng.uniform(0.1, 6, 100)
+        for low, high in [(a, b), (-1., 2.), (35., 40.)]:
+            x = _truncnorm_rvs(low, high, 2.5, 0.7, 100, np.random.RandomState(1))
+            y = truncnorm(low, high, loc=2.5, scale=0.7).rvs(100, random_state=np.random.RandomState(1))
+            self.assertTrue(np.allclose(x, y, rtol=0, atol=1e-12))
@@ -0,0 +1,75 @@
+import datetime
+import unittest
+from unittest import mock
+
+import numpy as np
+
+import simulator
+from run import run_simu
+from simulator import Human
+
+
+class EventDrivenSchedulerTest(unittest.TestCase):
+
+    def tearDown(self):
+        simulator.EVENT_DRIVEN_SCHEDULER = False
+
+    def run_simu(self, event_driven, n_people=300, init_percent_sick=0.1, simulation_days=10):
+        simulator.EVENT_DRIVEN_SCHEDULER = event_driven
+        monitors, tracker = run_simu(
+            n_people=n_people,
+            init_percent_sick=init_percent_sick,
+            start_time=datetime.datetime(2020, 2, 28, 0, 0),
+            simulation_days=simulation_days,
+            outfile=None,
+            seed=0
+        )
+        return monitors[1].data, tracker
+
+    def test_epidemic(self):
+        """
+        The whole population stays in the SEIR compartments and the epidemic spreads
+        """
+        seir, tracker = self.run_simu(event_driven=True)
+        n_people = sum(seir[0][x] for x in ['susceptible', 'exposed', 'infectious', 'removed'])
+        for row in seir:
+            self.assertEqual(sum(row[x] for x in ['susceptible', 'exposed', 'infectious', 'removed']), n_people)
+        self.assertLess(seir[-1]['susceptible'], seir[0]['susceptible'])
+        self.assertGreater(tracker.n_contacts, 0)
+
+    def test_rest_at_home(self):
+        """
+        Humans decide to rest at home as often as with the hourly loop: one draw stands for each hour slept.
+        The event-driven humans lag a little, as the hours of their last stay are drawn when they wake up.
+        """
+        rest = {}
+        with mock.patch.object(Human, 'how_am_I_feeling', lambda self: 0.99):
+            for event_driven in [False, True]:
+                _, tracker = self.run_simu(event_driven, init_percent_sick=0, simulation_days=3)
+                rest[event_driven] = np.mean([h.rest_at_home for h in tracker.city.humans])
+
+        # with one draw per wake-up, about 8% of the event-driven humans rest instead of about 40%
+        self.assertGreater(rest[False], 0.3)
+        self.assertAlmostEqual(rest[True], rest[False], delta=0.1)
+
+    def test_infections_at_home(self):
+        """
+        A stay at home is as infectious as the hourly stays it stands for: the co-residents and the surfaces
+        infect about as many humans in the households and senior residencies as with the hourly loop
+        """
+        def total(counts):
+            return sum(total(x) for x in counts.values()) if isinstance(counts, dict) else int(np.sum(counts))
+
+        infections = {}
+        for event_driven in [False, True]:
+            _, tracker = self.run_simu(event_driven)
+            infections[event_driven] = {
+                kind: sum(total(tracker.contacts[f"location_{kind}_infection"][x]) for x in ['household', 'senior_residency'])
+                for kind in ['human', 'env']
+            }
+
+        # with a single draw per stay, the event-driven residences had a third fewer human and 80% fewer environmental infections
+        self.assertGreater(infections[False]['human'], 50)
+        self.assertGreater(infections[False]['env'], 10)
+        self.assertAlmostEqual(infections[True]['human'] / infections[False]['human'], 1, delta=0.25)
+        self.assertAlmostEqual(infections[True]['env'] / infections[False]['env'], 1, delta=0.4)
@@ -0,0 +1,57 @@
+import datetime
+import unittest
+
+from run import run_simu
+
+
+class VectorizedEngineTest(unittest.TestCase):
+
+    def run_simu(self, seed, engine='vectorized'):
+        monitors, tracker = run_simu(
+            n_people=200,
+            init_percent_sick=0.1,
+            start_time=datetime.datetime(2020, 2, 28, 0, 0),
+            simulation_days=20,
+            outfile=None,
+            seed=seed,
+            engine=engine
+        )
+        return monitors[1].data, tracker
+
+    def test_epidemic(self):
+        """
+        The whole population stays in the SEIR compartments and the epidemic spreads through encounters
+        """
+        seir, tracker = self.run_simu(seed=0)
+        n_people = sum(seir[0][x] for x in ['susceptible', 'exposed', 'infectious', 'removed'])
+        for row in seir:
+            self.assertEqual(sum(row[x] for x in ['susceptible', 'exposed', 'infectious', 'removed']), n_people)
+
+        self.assertGreater(seir[-1]['removed'], 0)
+        self.assertLess(seir[-1]['susceptible'], seir[0]['susceptible'])
+        self.assertGreater(tracker.n_contacts, 0)
+        self.assertGreater(len(tracker.infection_graph.edges), 0)
+
+    def test_reproducibility(self):
+        """
+        Runs with the same seed give the same series
+        """
+        seir1, _ = self.run_simu(seed=0)
+        seir2, _ = self.run_simu(seed=0)
+        seir3, _ = self.run_simu(seed=1)
+        self.assertEqual(seir1, seir2)
+        self.assertNotEqual(seir1, seir3)
+
+    def test_same_epidemic(self):
+        """
+        The SEIR series is the one of the simpy engine on the same city, within 15% of the population
+        on each day, and the final attack rates are within 5%
+        """
+        seir, _ = self.run_simu(seed=0)
+        simpy_seir, _ = self.run_simu(seed=0, engine='simpy')
+        self.assertEqual(len(seir), len(simpy_seir))
+        n_people = sum(seir[0][x] for x in ['susceptible', 'exposed', 'infectious', 'removed'])
+        for row, simpy_row in zip(seir, simpy_seir):
+            for x in ['susceptible', 'exposed', 'infectious', 'removed']:
+                self.assertLessEqual(abs(row[x] - simpy_row[x]), 0.15 * n_people)
+        self.assertAlmostEqual(seir[-1]['susceptible'] / n_people, simpy_seir[-1]['susceptible'] / n_people, delta=0.05)
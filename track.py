@@ -60,6 +60,7 @@ class Tracker(object):
 
         self.dist_encounters = defaultdict(int)
         self.time_encounters = defaultdict(int)
+        self.location_encounters = defaultdict(int)
 
 
         # mobility
@@ -184,6 +185,7 @@ class Tracker(object):
         self.contacts["all"][bin1[0]][bin2[0]] += 1
         self.contacts["location_all"][location.location_type][bin1[0]][bin2[0]] += 1
         self.n_contacts += 1
+        self.location_encounters[location.location_type] += 1
 
         # bins of 50
         dist_bin = math.floor(distance/50) if distance <= INFECTION_RADIUS else math.floor(INFECTION_RADIUS/50)
@@ -191,6 +193,54 @@ class Tracker(object):
         # bins of 15 mins
         time_bin = math.floor(duration/15) if duration <= 60 else 4
 
+        self._roll_encounter_averages()
+        self.day_encounters[self.last_encounter_day][-1] += 1
+        self.hour_encounters[self.last_encounter_hour][-1] += 1
+        self.daily_age_group_encounters[bin1[1]][-1] += 1
+        self.daily_age_group_encounters[bin2[1]][-1] += 1
+        self.dist_encounters[dist_bin] += 1
+        self.time_encounters[time_bin] += 1
+
+    def track_encounter_counts(self, human, location, n):
+        """
+        Aggregate counterpart of `track_encounter_events` for `n` contacts of `human` (see `Location.n_contacts`),
+        used when encounters are not resolved pair by pair (INFECTION_ONLY_ENCOUNTERS).
+        Distance and duration distributions are not available in this mode.
+        """
+        for i, (l,u) in enumerate(self.age_bins):
+            if l <= human.age < u:
+                bin = (l,u)
+
+        self.n_contacts += n
+        self.location_encounters[location.location_type] += n
+
+        self._roll_encounter_averages()
+        self.day_encounters[self.last_encounter_day][-1] += n
+        self.hour_encounters[self.last_encounter_hour][-1] += n
+        self.daily_age_group_encounters[bin][-1] += n
+
+    def track_encounter_totals(self, n_contacts, location_contacts, age_group_contacts):
+        """
+        Aggregate counterpart of `track_encounter_counts` for `n_contacts` encounters, of which
+        `location_contacts[location_type]` happened at each location type. `age_group_contacts[i]`
+        counts the encounters reported by the humans of the i-th age bin.
+        """
+        self.n_contacts += n_contacts
+        for location_type, n in location_contacts.items():
+            self.location_encounters[location_type] += n
+
+        self._roll_encounter_averages()
+        self.day_encounters[self.last_encounter_day][-1] += n_contacts
+        self.hour_encounters[self.last_encounter_hour][-1] += n_contacts
+        for i, bin in enumerate(self.age_bins):
+            self.daily_age_group_encounters[bin][-1] += age_group_contacts[i]
+
+    def track_trip_counts(self, hour, counts):
+        """ Aggregate counterpart of `track_trip`: `counts[(age_bin, from_location, to_location)]` trips at `hour` """
+        for (bin, from_location, to_location), n in counts.items():
+            self.transition_probability[hour][bin][from_location][to_location] += n
+
+    def _roll_encounter_averages(self):
         hour = self.env.hour_of_day()
         day = self.env.day_of_week()
         if self.last_encounter_day != day:
@@ -209,13 +259,6 @@ class Tracker(object):
             self.hour_encounters[self.last_encounter_hour] = [n+1, (avg * n + last_hour_count)/(n + 1), 0]
             self.last_encounter_hour = hour
 
-        self.day_encounters[self.last_encounter_day][-1] += 1
-        self.hour_encounters[self.last_encounter_hour][-1] += 1
-        self.daily_age_group_encounters[bin1[1]][-1] += 1
-        self.daily_age_group_encounters[bin2[1]][-1] += 1
-        self.dist_encounters[dist_bin] += 1
-        self.time_encounters[time_bin] += 1
-
     def write_metrics(self, logfile):
         log("######## DEMOGRAPHICS #########", logfile)
         log(f"age distribution\n {self.age_distribution.describe()}", logfile)
@@ -263,32 +306,32 @@ class Tracker(object):
         x = ['Mon', "Tue", "Wed", "Thurs", "Fri", "Sat", "Sun"]
         for c,day in enumerate(x):
             v = self.day_encounters[c]
-            log(f"{day} #avg: {v[1]} %:{100*v[1]/total:5.2f} ", logfile)
+            log(f"{day} #avg: {v[1]} %:{100*v[1]/total if total else 0:5.2f} ", logfile)
 
         log("Hour - ", logfile)
         total = sum(v[1] for v in self.hour_encounters.values())
         for hour, v in self.hour_encounters.items():
-            log(f"{hour} #avg: {v[1]} %:{100*v[1]/total:5.2f} ", logfile)
+            log(f"{hour} #avg: {v[1]} %:{100*v[1]/total if total else 0:5.2f} ", logfile)
 
         log("Distance (cm) - ", logfile)
         x = ['0 - 50', "50 - 100", "100 - 150", "150 - 200", ">= 200"]
         total = sum(self.dist_encounters.values())
         for c, dist in enumerate(x):
             v = self.dist_encounters[c]
-            log(f"{dist} #avg: {v} %:{100*v/total:5.2f} ", logfile)
+            log(f"{dist} #avg: {v} %:{100*v/total if total else 0:5.2f} ", logfile)
 
         log("Time (min) ", logfile)
         x = ['0 - 15', "15 - 30", "30 - 45", "45 - 60", ">= 60"]
         total = sum(self.time_encounters.values())
         for c, bin in enumerate(x):
             v = self.time_encounters[c]
-            log(f"{bin} #avg: {v} %:{100*v/total:5.2f} ", logfile)
+            log(f"{bin} #avg: {v} %:{100*v/total if total else 0:5.2f} ", logfile)
 
         log("Average Daily Contacts ", logfile)
         total = sum(x[1] for x in self.daily_age_group_encounters.values())
         for bin in self.age_bins:
             v = self.daily_age_group_encounters[bin][1]
-            log(f"{bin} #avg: {v} %:{100*v/total:5.2f} ", logfile)
+            log(f"{bin} #avg: {v} %:{100*v/total if total else 0:5.2f} ", logfile)
 
     def plot_metrics(self, dirname):
         import matplotlib.pyplot as plt
@@ -1,11 +1,13 @@
 import numpy as np
 from scipy.stats import norm, truncnorm, gamma
+from scipy.special import ndtr, ndtri
 import datetime
 import math
 import json
 from bitarray import bitarray
 from config import *
 from functools import lru_cache
+from samplers import CategoricalSampler
 
 def log(str, logfile=None, timestamp=False):
 	if timestamp:
@@ -30,16 +32,41 @@ def _sample_viral_load_gamma(rng, shape_mean=4.5, shape_std=.15, scale_mean=1.,
 def _sample_viral_load_piecewise(rng, age=40):
 	""" This function samples a piece-wise linear viral load model which increases, plateaus, and drops """
 	# https://stackoverflow.com/questions/18441779/how-to-specify-upper-and-lower-limits-when-using-numpy-random-normal
-	plateau_start = truncnorm((PLATEAU_START_CLIP_LOW - PLATEAU_START_MEAN)/PLATEAU_START_STD, (PLATEAU_START_CLIP_HIGH - PLATEAU_START_MEAN) / PLATEAU_START_STD, loc=PLATEAU_START_MEAN, scale=PLATEAU_START_STD).rvs(1, random_state=rng)
-	plateau_end = plateau_start + truncnorm((PLATEAU_DURATION_CLIP_LOW - PLATEAU_DURATION_MEAN)/PLEATEAU_DURATION_STD,
-											(PLATEAU_DURATION_CLIP_HIGH - PLATEAU_DURATION_MEAN) / PLEATEAU_DURATION_STD,
-											loc=PLATEAU_DURATION_MEAN, scale=PLEATEAU_DURATION_STD).rvs(1, random_state=rng)
-	recovered = plateau_end + ((age/10)-1) # age is a determining factor for the recovery time
-	recovered = recovered + truncnorm((plateau_end - RECOVERY_MEAN) / RECOVERY_STD,
-										(RECOVERY_CLIP_HIGH - RECOVERY_MEAN) / RECOVERY_STD,
-										loc=RECOVERY_MEAN, scale=RECOVERY_STD).rvs(1, random_state=rng)
-	plateau_height = rng.uniform(MIN_VIRAL_LOAD, MAX_VIRAL_LOAD)
-	return plateau_height, plateau_start, plateau_end, recovered
+	return tuple(x.item() for x in _sample_viral_load_piecewise_batch(rng, np.array([age])))
+
+def _sample_viral_load_piecewise_batch(rng, ages):
+    # vectorized _sample_viral_load_piecewise, for an array of ages
+    n = len(ages)
+    (start_low, start_high), (duration_low, duration_high), recovery_high = _get_viral_load_truncation()
+    plateau_start = _truncnorm_rvs(start_low, start_high, PLATEAU_START_MEAN, PLATEAU_START_STD, n, rng)
+    plateau_end = plateau_start + _truncnorm_rvs(duration_low, duration_high, PLATEAU_DURATION_MEAN, PLEATEAU_DURATION_STD, n, rng)
+    recovered = plateau_end + ((ages/10)-1) # age is a determining factor for the recovery time
+    recovered = recovered + _truncnorm_rvs((plateau_end - RECOVERY_MEAN) / RECOVERY_STD, recovery_high, RECOVERY_MEAN, RECOVERY_STD, n, rng)
+    plateau_height = rng.uniform(MIN_VIRAL_LOAD, MAX_VIRAL_LOAD, size=n)
+    return plateau_height, plateau_start, plateau_end, recovered
+
+@lru_cache()
+def _get_viral_load_truncation():
+    # standardized truncation bounds of the plateau start, plateau duration and recovery distributions
+    return (((PLATEAU_START_CLIP_LOW - PLATEAU_START_MEAN) / PLATEAU_START_STD, (PLATEAU_START_CLIP_HIGH - PLATEAU_START_MEAN) / PLATEAU_START_STD),
+            ((PLATEAU_DURATION_CLIP_LOW - PLATEAU_DURATION_MEAN) / PLEATEAU_DURATION_STD, (PLATEAU_DURATION_CLIP_HIGH - PLATEAU_DURATION_MEAN) / PLEATEAU_DURATION_STD),
+            (RECOVERY_CLIP_HIGH - RECOVERY_MEAN) / RECOVERY_STD)
+
+def _truncnorm_rvs(a, b, loc, scale, size, rng):
+    # truncnorm(a, b, loc=loc, scale=scale).rvs(size, random_state=rng), with scipy's inverse cdf computed on
+    # whole arrays instead of element by element; same draws from the same random stream
+    q = rng.uniform(size=size)
+    a, b = np.broadcast_to(a, q.shape).astype(np.float64), np.broadcast_to(b, q.shape).astype(np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        x = np.where(a > 0, -ndtri(q * ndtr(-b) + ndtr(-a) * (1.0 - q)), ndtri(q * ndtr(b) + ndtr(a) * (1.0 - q)))
+    x = np.where(q <= 0, a, x)
+
+    # far in the tails, scipy switches to log-space root finding
+    delta = np.where(a > 0, ndtr(-a) - ndtr(-b), ndtr(b) - ndtr(a))
+    tail = (a > 30) | (b < -30) | (delta <= 0)
+    if tail.any():
+        x[tail] = truncnorm.ppf(q[tail], a[tail], b[tail])
+    return x * scale + loc
 
 def _normalize_scores(scores):
     return np.array(scores)/np.sum(scores)
@@ -65,6 +92,11 @@ def _get_random_sex(rng):
 	else:
 		return 'other'
 
+def _get_random_sexes(n, rng):
+    # vectorized _get_random_sex
+    p = rng.random_sample(n)
+    return np.where(p < .4, 'female', np.where(p < .8, 'male', 'other'))
+
 # 2D Array of symptoms; first axis is days after exposure (infection), second is an array of symptoms
 def _get_all_symptoms(viral_load_plateau_start, viral_load_plateau_end,
 	                        viral_load_recovered, age, incubation_days, really_sick, extremely_sick,
@@ -137,6 +169,45 @@ def _get_all_symptoms(viral_load_plateau_start, viral_load_plateau_end,
             symptoms_array.append(symptoms)
         return symptoms_array
 
+def _get_all_symptoms_batch(viral_load_plateau_start, viral_load_plateau_end, viral_load_recovered,
+                            incubation_days, really_sick, extremely_sick, has_preexisting_conditions, rng):
+    # vectorized _get_all_symptoms, for arrays over humans; returns the list of symptoms arrays of each human
+    n_days = [
+        np.maximum(np.round(viral_load_plateau_start) - 1, 0).astype(int), # before the plateau
+        np.maximum(np.round(viral_load_plateau_end - viral_load_plateau_start), 0).astype(int), # during the plateau
+        np.maximum(np.round(viral_load_recovered - viral_load_plateau_end), 0).astype(int), # after the plateau
+    ]
+    humans = [np.repeat(np.arange(len(incubation_days)), n) for n in n_days]
+
+    # main symptom of each day
+    h = humans[0]
+    before = np.where(really_sick[h] | extremely_sick[h] | has_preexisting_conditions[h], 'moderate', 'mild')
+    h = humans[1]
+    during = np.select([really_sick[h] | has_preexisting_conditions[h], extremely_sick[h], rng.random_sample(len(h)) < 0.4],
+                       ['severe', 'extremely-severe', 'moderate'], 'mild')
+    h = humans[2]
+    after = np.where(really_sick[h] | extremely_sick[h], 'moderate', 'mild')
+
+    # other symptoms of each day, with their daily probability
+    others = [
+        [('fever', 0.9), ('cough', 0.7), ('fatigue', 0.5), ('trouble_breathing', 0.3), ('gastro', 0.4)],
+        [('fever', 0.9), ('cough', 0.85), ('fatigue', 0.8), ('trouble_breathing', 0.7), ('runny_nose', 0.1), ('loss_of_taste', 0.4), ('gastro', 0.1)],
+        [('cough', 0.3), ('fatigue', 0.8), ('aches', 0.5), ('trouble_breathing', 0.3), ('gastro', 0.2)],
+    ]
+
+    phases = []
+    for main, symptoms in zip([before, during, after], others):
+        names, p = zip(*symptoms)
+        codes = (rng.random_sample((len(main), len(p))) < p) @ (1 << np.arange(len(p)))
+        names_by_code = [[names[j] for j in range(len(p)) if code >> j & 1] for code in range(1 << len(p))]
+        phases.append([[m] + names_by_code[c] for m, c in zip(main.tolist(), codes.tolist())])
+
+    offsets = [np.concatenate([[0], np.cumsum(n)]).tolist() for n in n_days]
+    return [
+        [[] for _ in range(incubation_days[i])] + [d for k, days in enumerate(phases) for d in days[offsets[k][i]:offsets[k][i + 1]]]
+        for i in range(len(incubation_days))
+    ]
+
 def _reported_symptoms(all_symptoms, rng, carefulness):
 	all_reported_symptoms = []
 	for symptoms in all_symptoms:
@@ -151,6 +222,26 @@ def _reported_symptoms(all_symptoms, rng, carefulness):
 		all_reported_symptoms.append(reported_symptoms)
 	return all_reported_symptoms
 
+def _reported_symptoms_batch(all_symptoms, rng, carefulness):
+    # vectorized _reported_symptoms, for lists of symptoms arrays and an array of carefulness
+    n_days = [len(x) for x in all_symptoms]
+    day_carefulness = np.repeat(carefulness, n_days)
+    missed = (rng.random_sample(len(day_carefulness)) < day_carefulness).tolist()
+    n_symptoms = [len(symptoms) for x in all_symptoms for symptoms in x]
+    skipped = (rng.random_sample(sum(n_symptoms)) < np.repeat(day_carefulness, n_symptoms)).tolist()
+
+    all_reported_symptoms = []
+    day = k = 0
+    for x in all_symptoms:
+        reported_symptoms = []
+        for symptoms in x:
+            if not missed[day]:
+                reported_symptoms.append([symptom for j, symptom in enumerate(symptoms) if not skipped[k + j]])
+            k += len(symptoms)
+            day += 1
+        all_reported_symptoms.append(reported_symptoms)
+    return all_reported_symptoms
+
 # &preexisting-conditions
 def _get_preexisting_conditions(age, sex, rng):
 	#if rng.rand() < 0.6 + age/200:
@@ -286,6 +377,26 @@ def _get_preexisting_conditions(age, sex, rng):
 	return conditions
 
 
+def _get_preexisting_conditions_batch(ages, sexes, rng):
+    # vectorized _get_preexisting_conditions, for arrays of ages and sexes
+    female, male = np.char.startswith(sexes, 'f'), np.char.startswith(sexes, 'm')
+    def by_sex(p_female, p_male, p_other):
+        return np.where(female, p_female, np.where(male, p_male, p_other))
+
+    p = {
+        'immuno-suppressed': np.select([ages < 40, ages < 65, ages < 85], [.005, .036, .045], .20),
+        'diabetes': np.select([ages < 18, ages < 35, ages < 50, ages < 75], [.005, .009, .039, .13], .179),
+        'heart_disease': np.select([ages < 20, ages < 35, ages < 50, ages < 75],
+                                   [.001, .005, by_sex(.013, .021, .017), by_sex(.13, .178, .15)], by_sex(.311, .44, .375)),
+        'COPD': np.select([ages < 35, ages < 50, ages < 65], [0., .015, .037], .075),
+        'asthma': np.select([ages < 10, ages < 25, ages < 75],
+                            [by_sex(.07, .12, .09), by_sex(.15, .19, .17), by_sex(.11, .06, .08)], by_sex(.12, .08, .1)),
+    }
+    names = list(p)
+    has = rng.random_sample((len(ages), len(names))) < np.stack([p[x] for x in names], axis=1)
+    return [[names[j] for j in np.flatnonzero(row)] for row in has]
+
+
 # &canadian-demgraphics
 def _get_random_age_multinomial(AGE_DISTRIBUTION, rng):
     x = list(zip(*AGE_DISTRIBUTION.items()))
@@ -318,8 +429,35 @@ def _get_random_area(num, total_area, rng):
 
 def _draw_random_discreet_gaussian(avg, scale, rng):
     # https://stackoverflow.com/a/37411711/3413239
-    irange, normal_pdf = _get_integer_pdf(avg, scale, 2)
-    return int(rng.choice(irange, size=1, p=normal_pdf))
+    return int(_get_discreet_gaussian_sampler(avg, scale).sample(rng, size=1))
+
+def _draw_random_discreet_gaussians(avg, scale, rng):
+    # vectorized _draw_random_discreet_gaussian, for arrays of avg and scale
+    avg, scale = np.broadcast_arrays(avg, scale)
+    offsets = np.empty(avg.shape, dtype=int)
+    for s in np.unique(scale):
+        mask = scale == s
+        offsets[mask] = _get_discreet_gaussian_sampler(0, s).sample(rng, size=mask.sum())
+    return avg + offsets
+
+def _get_feeling(symptoms):
+    # 1.0 (great) to 0.0 (worst)
+    if symptoms == []:
+        return 1.0
+
+    if sum(x in symptoms for x in ["severe", "extremely_severe", "trouble_breathing"]) > 0:
+        return 0.0
+
+    elif sum(x in symptoms for x in ["moderate", "mild", "fever"]) > 0:
+        return 0.3
+
+    elif sum(x in symptoms for x in ["cough", "fatigue", "gastro", "aches"]) > 0:
+        return 0.5
+
+    elif sum(x in symptoms for x in ["runny_nose", "loss_of_taste"]) > 0:
+        return 0.7
+
+    return 0.9
 
 def _json_serialize(o):
     if isinstance(o, datetime.datetime):
@@ -328,6 +466,30 @@ def _json_serialize(o):
 def compute_distance(loc1, loc2):
     return np.sqrt((loc1.lat - loc2.lat) ** 2 + (loc1.lon - loc2.lon) ** 2)
 
+def compute_distances(locs1, locs2):
+    # matrix of the distances between each location of locs1 (rows) and each location of locs2 (columns)
+    lat1, lon1 = np.array([l.lat for l in locs1]), np.array([l.lon for l in locs1])
+    lat2, lon2 = np.array([l.lat for l in locs2]), np.array([l.lon for l in locs2])
+    return np.sqrt((lat1[:, None] - lat2) ** 2 + (lon1[:, None] - lon2) ** 2)
+
+def compute_preferences(locs1, locs2, k=None, chunk_size=4096):
+    # preference (inverse distance) of each location of locs1 (rows) for the locations of locs2. With `k`, only for
+    # its k nearest ones, returned as the (rows, k) matrices of their indices in locs2 and of the preferences;
+    # the indices are None when the preferences cover all of locs2
+    if k is None or k >= len(locs2):
+        return None, (compute_distances(locs1, locs2) + 1e-1) ** -1
+
+    nearest = np.empty((len(locs1), k), dtype=np.int32)
+    distances = np.empty((len(locs1), k))
+    for start in range(0, len(locs1), chunk_size):
+        d = compute_distances(locs1[start:start + chunk_size], locs2)
+        i = np.argpartition(d, k - 1, axis=1)[:, :k]
+        d = np.take_along_axis(d, i, axis=1)
+        order = np.argsort(d, axis=1, kind='stable')
+        nearest[start:start + chunk_size] = np.take_along_axis(i, order, axis=1)
+        distances[start:start + chunk_size] = np.take_along_axis(d, order, axis=1)
+    return nearest, (distances + 1e-1) ** -1
+
 def _encode_message(message):
 	# encode a contact message as a string
 	# TODO: clean up the bitarray => string transformation
@@ -343,6 +505,10 @@ def _decode_message(message):
 	unobs_uid = int(m_i[3])
 	return obs_uid, risk, date_sent, unobs_uid
 
+@lru_cache(500)
+def _get_discreet_gaussian_sampler(avg, scale):
+    return CategoricalSampler(*_get_integer_pdf(avg, scale, 2))
+
 @lru_cache(500)
 def _get_integer_pdf(avg, scale, num_sigmas=2):
     irange = np.arange(avg - num_sigmas * scale, avg + num_sigmas * scale + 1)
@@ -0,0 +1,380 @@
+import numpy as np
+
+import simulator
+from config import *
+from utils import compute_distances, _draw_random_discreet_gaussians, _get_feeling
+from samplers import categorical
+
+
+class VectorizedEngine(object):
+    """
+    Time-stepped alternative to running `Human.run` as one simpy process per human. The whole city
+    is advanced in steps of `step_minutes`; disease progression, mobility decisions, occupancy,
+    encounters and infections are array operations over `city.population`. Only the state
+    transitions (symptom onset, infection, recovery) go through the `Human` objects, so that the
+    `Tracker` metrics and the monitors are computed as with the simpy engine.
+
+    Simplifications with respect to the simpy engine:
+        - trips start at step boundaries and the humans present at a location in a step are taken
+          to have arrived together,
+        - stores and parks are drawn from the preferences, without the exploration/exploitation
+          of past visits, and a leisure trip is a single misc visit,
+        - the capacities of stores and miscs are not enforced (hospitals and ICUs are),
+        - encounters are not logged as events.
+    """
+
+    def __init__(self, city, step_minutes=60):
+        self.env = city.env
+        self.city = city
+        self.rng = city.rng
+        self.population = city.population
+        self.humans = city.humans
+        self.step_minutes = step_minutes
+        n = len(self.humans)
+
+        # locations, indexed by their position in self.locations
+        self.locations = list(city.households)
+        for type in LOCATION_DISTRIBUTION:
+            if type != 'household':
+                self.locations += getattr(city, f"{type}s")
+        self.locations += [hospital.icu for hospital in city.hospitals]
+        self.location_id = location_id = {loc: i for i, loc in enumerate(self.locations)}
+
+        self.area = np.array([loc.area for loc in self.locations], dtype=float)
+        self.social_contact_factor = np.array([loc.social_contact_factor for loc in self.locations])
+        self.location_types = sorted(set(loc.location_type for loc in self.locations))
+        self.location_type = np.array([self.location_types.index(loc.location_type) for loc in self.locations])
+        self.capacity = np.array([loc.capacity for loc in self.locations], dtype=float)
+        self.surface_cdf = np.cumsum([loc.contaminated_surface_probability for loc in self.locations], axis=1)
+        self.contamination_tick = np.full(len(self.locations), -np.inf)
+        self.max_day_contamination = np.zeros(len(self.locations))
+        self.stores = np.array([location_id[loc] for loc in city.stores])
+        self.parks = np.array([location_id[loc] for loc in city.parks])
+        self.miscs = np.array([location_id[loc] for loc in city.miscs])
+
+        # static attributes of the humans
+        self.household = np.array([location_id[h.household] for h in self.humans])
+        self.workplace = np.array([location_id[h.workplace] for h in self.humans])
+        self.n_age_bins = len(city.tracker.age_bins)
+        self.age_bin = np.searchsorted([l for l, u in city.tracker.age_bins], self.population.age, side='right') - 1
+        self.immuno_compromised = np.array(['immuno-compromised' in h.preexisting_conditions for h in self.humans], dtype=bool)
+        self.work_hours = self._hours_mask([h.work_start_hour for h in self.humans], 24)
+        self.shopping_hours = self._hours_mask([h.shopping_hours for h in self.humans], 24)
+        self.shopping_days = self._hours_mask([h.shopping_days for h in self.humans], 7)
+        self.exercise_hours = self._hours_mask([h.exercise_hours for h in self.humans], 24)
+        self.exercise_days = self._hours_mask([h.exercise_days for h in self.humans], 7)
+
+        # per sickness day: how the human feels, and whether the symptoms are severe or include a cough
+        # (with LAZY_DISEASE_COURSE, filled in when the human gets infected)
+        n_days = max([len(h.all_symptoms) for h in self.humans if h.all_symptoms is not None], default=1)
+        self.feeling = np.ones((n, n_days))
+        self.severe = np.zeros((n, n_days), dtype=bool)
+        self.cough = np.zeros((n, n_days), dtype=bool)
+        for i, h in enumerate(self.humans):
+            if h.all_symptoms is not None:
+                self._record_symptoms(i)
+
+        # current trips; humans are at home when trip_location is -1
+        self.active = np.ones(n, dtype=bool) # False once dead, or when no hospital could take them
+        self.trip_location = np.full(n, -1)
+        self.trip_minutes = np.zeros(n) # left to spend at the trip location
+        self.trip_started = np.zeros(n, dtype=bool)
+
+    def _record_symptoms(self, i):
+        all_symptoms = self.humans[i].all_symptoms
+        if len(all_symptoms) > self.feeling.shape[1]:
+            extra = len(all_symptoms) - self.feeling.shape[1]
+            self.feeling = np.pad(self.feeling, ((0, 0), (0, extra)), constant_values=1.0)
+            self.severe = np.pad(self.severe, ((0, 0), (0, extra)))
+            self.cough = np.pad(self.cough, ((0, 0), (0, extra)))
+        for day, symptoms in enumerate(all_symptoms):
+            self.feeling[i, day] = _get_feeling(symptoms)
+            self.severe[i, day] = 'severe' in symptoms
+            self.cough[i, day] = 'cough' in symptoms
+
+    @staticmethod
+    def _hours_mask(values, n_values):
+        mask = np.zeros((len(values), n_values), dtype=bool)
+        for i, v in enumerate(values):
+            mask[i, v] = True
+        return mask
+
+    def run(self):
+        while True:
+            with np.errstate(invalid='ignore', divide='ignore'):
+                self.step()
+            yield self.env.timeout(self.step_minutes / TICK_MINUTE)
+
+    def step(self):
+        now = self.env.now
+        self._progress_disease(now)
+        feeling, severe, cough = self._symptoms(now)
+        self._move(now, feeling, severe)
+
+        humans, locations, stay, arriving, leaving = self._presence()
+        infectious = self.population.is_infectious(now) & self.active
+        self._contaminate(now, locations[arriving & infectious[humans]])
+        self._encounters(now, humans, locations, stay, arriving, infectious, severe, cough)
+        self._environmental_transmission(now, humans[leaving], locations[leaving])
+
+        self.trip_minutes -= self.step_minutes
+        self.trip_started[:] = False
+
+    ############################## DISEASE ##################################
+    def _progress_disease(self, now):
+        population = self.population
+        onset = self.active & ~population.is_asymptomatic & (now >= population.incubated_tick) & ~population.has_logged_symptoms
+        for i in np.flatnonzero(onset):
+            self.humans[i].start_symptoms(self.city)
+
+        for i in np.flatnonzero(self.active & population.is_infectious(now) & (now >= population.recovery_tick)):
+            if self.humans[i].recover(self.city):
+                self.active[i] = False
+
+    def _symptoms(self, now):
+        """ How each human feels, and whether its current symptoms are severe or include a cough """
+        population = self.population
+        day = np.floor((now - population.infection_tick) / TICKS_PER_DAY)
+        sick = ~np.isnan(day) & ~population.is_asymptomatic & (day < self.feeling.shape[1])
+        day = np.where(sick, day, 0).astype(int)
+        rows = np.arange(len(day))
+        feeling = np.where(sick, self.feeling[rows, day], 1.0)
+        return feeling, sick & self.severe[rows, day], sick & self.cough[rows, day]
+
+    def _infectiousness(self, now, severe, cough):
+        """ `Human.infectiousness`, weighted by the asymptomatic infection ratio, for every infectious human """
+        p = self.population
+        days = (now - p.infection_tick) / TICKS_PER_DAY
+        height = p.viral_load_plateau_height
+        viral_load = np.where(days < p.viral_load_plateau_start, height * days / p.viral_load_plateau_start,
+                              np.where(days < p.viral_load_plateau_end, height,
+                                       height - height * (days - p.viral_load_plateau_end) / (p.viral_load_recovered - p.viral_load_plateau_end)))
+        viral_load = np.maximum(np.nan_to_num(viral_load), 0)
+
+        severity_multiplier = np.where(p.gets_extremely_sick & severe, 1.5, np.where(p.gets_really_sick, 1.25, 1.0))
+        severity_multiplier += 0.2 * self.immuno_compromised + 0.25 * cough
+        ratio = np.where(p.is_asymptomatic, p.asymptomatic_infection_ratio, 1.0)
+        return viral_load * severity_multiplier * ratio
+
+    def _infect(self, human, location, source=None):
+        timestamp = self.env.timestamp
+        human.infection_timestamp = timestamp
+        human.historical_infection_timestamp = timestamp
+        if LAZY_DISEASE_COURSE:
+            self._record_symptoms(human.idx)
+        if source is None:
+            simulator.Event.log_exposed(human, location, timestamp)
+            self.city.tracker.track_infection('env', from_human=None, to_human=human, location=location, timestamp=timestamp)
+        else:
+            source.n_infectious_contacts += 1
+            simulator.Event.log_exposed(human, source, timestamp)
+            self.city.tracker.track_infection('human', from_human=source, to_human=human, location=location, timestamp=timestamp)
+
+    ############################## MOBILITY ##################################
+    def _move(self, now, feeling, severe):
+        population, rng = self.population, self.rng
+        hour, day = self.env.hour_of_day(), self.env.day_of_week()
+        home_type = self.location_type[self.household]
+
+        back = self.active & (self.trip_location >= 0) & (self.trip_minutes <= 0)
+        self._track_trips(self.location_type[self.trip_location[back]], home_type[back], self.age_bin[back], hour)
+        self.trip_location[back] = -1
+
+        free = self.active & (self.trip_location < 0)
+        if day == 0:
+            population.count_shop[:] = 0
+            population.count_exercise[:] = 0
+
+        rest = population.rest_at_home
+        fine = free & ~rest
+        resting = free & rest
+        rest[fine] = rng.random_sample(fine.sum()) >= feeling[fine]
+        rest[resting & (feeling == 1.0)] = False
+
+        self._hospitalize(now, np.flatnonzero(free & severe & population.gets_extremely_sick), icu=True)
+        self._hospitalize(now, np.flatnonzero(free & severe & population.gets_really_sick & ~population.gets_extremely_sick), icu=False)
+
+        candidates = free & ~rest & (self.trip_location < 0) & self.active
+        weekend = self.env.is_weekend()
+        if not WORK_FROM_HOME and not weekend:
+            work = candidates & self.work_hours[:, hour]
+            self._start_trips(work, self.workplace[work],
+                              _draw_random_discreet_gaussians(population.avg_working_minutes[work], population.scale_working_minutes[work], rng))
+            candidates &= ~work
+
+        shop = candidates & self.shopping_hours[:, hour] & self.shopping_days[:, day] & (population.count_shop <= population.max_shop_per_week)
+        population.count_shop[shop] += 1
+        self._start_trips(shop, self.stores[self._choose_preferred(shop, population.stores_preferences, population.stores_preferred)],
+                          _draw_random_discreet_gaussians(population.avg_shopping_time[shop], population.scale_shopping_time[shop], rng))
+        candidates &= ~shop
+
+        exercise = candidates & self.exercise_hours[:, hour] & self.exercise_days[:, day] & (population.count_exercise <= population.max_exercise_per_week)
+        population.count_exercise[exercise] += 1
+        self._start_trips(exercise, self.parks[self._choose_preferred(exercise, population.parks_preferences, population.parks_preferred)],
+                          _draw_random_discreet_gaussians(population.avg_exercise_time[exercise], population.scale_exercise_time[exercise], rng))
+        candidates &= ~exercise
+
+        if weekend:
+            idx = np.flatnonzero(candidates)
+            leisure = np.zeros_like(candidates)
+            leisure[idx[rng.random_sample(len(idx)) < P_LEISURE_PER_WEEKEND_HOUR]] = True
+            households = [self.locations[i] for i in self.household[leisure]]
+            preferences = (compute_distances(households, [self.locations[i] for i in self.miscs]) + 1e-1) ** -1
+            self._start_trips(leisure, self.miscs[self._choose(preferences)],
+                              _draw_random_discreet_gaussians(population.avg_misc_time[leisure], population.scale_misc_time[leisure], rng))
+
+        staying = free & (self.trip_location < 0) & self.active
+        self._track_trips(home_type[staying], home_type[staying], self.age_bin[staying], hour)
+        starting = self.trip_started
+        self._track_trips(home_type[starting], self.location_type[self.trip_location[starting]], self.age_bin[starting], hour)
+
+    def _track_trips(self, from_types, to_types, age_bins, hour):
+        n_types = len(self.location_types)
+        trips, counts = np.unique((age_bins * n_types + from_types) * n_types + to_types, return_counts=True)
+        self.city.tracker.track_trip_counts(hour, {
+            (trip // n_types ** 2, self.location_types[trip // n_types % n_types], self.location_types[trip % n_types]): n
+            for trip, n in zip(trips.tolist(), counts.tolist())
+        })
+
+    def _choose(self, weights):
+        """ Index of a column drawn in proportion to `weights`, for each row """
+        cdf = np.cumsum(weights, axis=1)
+        u = self.rng.random_sample(len(cdf)) * cdf[:, -1]
+        return np.minimum((cdf <= u[:, None]).sum(axis=1), weights.shape[1] - 1)
+
+    def _choose_preferred(self, mask, preferences, preferred):
+        """ Index of a location drawn from the preferences of each human of `mask` (see Population.stores_preferred) """
+        choice = self._choose(preferences[mask])
+        if preferred is None:
+            return choice
+        return preferred[mask][np.arange(len(choice)), choice]
+
+    def _start_trips(self, mask, locations, minutes):
+        self.trip_location[mask] = locations
+        self.trip_minutes[mask] = np.maximum(minutes, 1)
+        self.trip_started[mask] = True
+
+    def _hospitalize(self, now, humans, icu):
+        """ Sends `humans` to the closest hospital (or ICU) with a free bed, for the time `Human.excursion` would """
+        if len(humans) == 0:
+            return
+        occupancy = np.bincount(self.trip_location[self.trip_location >= 0], minlength=len(self.locations))
+        def has_bed(hospital):
+            loc = self.location_id[hospital]
+            return occupancy[loc] < self.capacity[loc]
+
+        for i in humans:
+            h = self.humans[i]
+            hospital = self.city.hospital_index.nearest(h.household, icu=icu, has_bed=has_bed)
+            if hospital is None:
+                # as in the simpy engine, the human waits for a bed forever
+                self.active[i] = False
+                continue
+            hospital = self.location_id[hospital]
+
+            if icu:
+                if len(h.preexisting_conditions) < 2:
+                    extra_time = categorical((1, 2, 3), (0.5, 0.3, 0.2)).sample(self.rng)
+                else:
+                    extra_time = categorical((1, 2, 3), (0.2, 0.3, 0.5)).sample(self.rng) # DAYS
+                minutes = (h.viral_load_plateau_end - h.viral_load_plateau_start + extra_time) * 24 * 60
+            else:
+                minutes = (h.recovery_tick - now) * TICK_MINUTE
+            occupancy[hospital] += 1
+            mask = np.zeros(len(self.humans), dtype=bool)
+            mask[i] = True
+            self._start_trips(mask, hospital, minutes)
+
+    ############################## ENCOUNTERS ##################################
+    def _presence(self):
+        """
+        Presence records of this step: for each human at a location, the location, the minutes left
+        to spend there, and whether the human arrives there and leaves it during this step. A human
+        whose trip ends within the step spends the rest of the step at home; as in `Human.run`,
+        every hour at home is a separate visit.
+        """
+        away = self.active & (self.trip_location >= 0)
+        minutes_away = np.where(away, np.minimum(self.trip_minutes, self.step_minutes), 0)
+        trips = np.flatnonzero(away)
+        home = np.flatnonzero(self.active & (minutes_away < self.step_minutes))
+
+        humans = np.concatenate([trips, home])
+        locations = np.concatenate([self.trip_location[trips], self.household[home]])
+        stay = np.concatenate([self.trip_minutes[trips], self.step_minutes - minutes_away[home]])
+        arriving = np.concatenate([self.trip_started[trips], np.ones(len(home), dtype=bool)])
+        leaving = np.concatenate([self.trip_minutes[trips] <= self.step_minutes, np.ones(len(home), dtype=bool)])
+        return humans, locations, stay, arriving, leaving
+
+    def _contaminate(self, now, locations):
+        """ Contamination of the surfaces of `locations` by the arrival of infectious humans (see `Location.add_human`) """
+        if len(locations) == 0:
+            return
+        surface = (self.surface_cdf[locations] <= self.rng.random_sample(len(locations))[:, None]).sum(axis=1)
+        self.contamination_tick[locations] = now
+        np.maximum.at(self.max_day_contamination, locations, np.take(MAX_DAYS_CONTAMINATION, np.minimum(surface, len(MAX_DAYS_CONTAMINATION) - 1)))
+
+    def _encounters(self, now, humans, locations, stay, arriving, infectious, severe, cough):
+        """
+        As in `Human.at`, the encounters of a visit are resolved when it starts: each pair of occupants
+        with at least one arrival in this step is resolved once, for the time they will spend together.
+        """
+        rng = self.rng
+
+        # probability that a pair is within INFECTION_RADIUS (see `Location.encounter_distances`)
+        occupancy = np.bincount(locations, minlength=len(self.locations))
+        base = np.sqrt(np.floor(self.area / np.maximum(occupancy, 1)))
+        n_close = np.clip(np.floor(INFECTION_RADIUS - base) - MIN_DIST_ENCOUNTER + 1, 0, MAX_DIST_ENCOUNTER - MIN_DIST_ENCOUNTER)
+        p_close = n_close / (MAX_DIST_ENCOUNTER - MIN_DIST_ENCOUNTER)
+
+        # contacts reported by each arrival with the occupants already there, for the tracker
+        new = np.flatnonzero(arriving)
+        new = new[np.argsort(locations[new], kind='stable')]
+        n_arrivals = np.bincount(locations[new], minlength=len(self.locations))
+        rank = np.arange(len(new)) - np.searchsorted(locations[new], locations[new], side='left')
+        p_long = np.clip(1 - INFECTION_DURATION / stay[new], 0, 1)
+        loc = locations[new]
+        n_contacts = rng.binomial(occupancy[loc] - n_arrivals[loc] + rank, p_close[loc] * p_long)
+        location_contacts = np.bincount(self.location_type[loc], weights=n_contacts, minlength=len(self.location_types))
+        age_group_contacts = np.bincount(self.age_bin[humans[new]], weights=n_contacts, minlength=self.n_age_bins)
+        self.city.tracker.track_encounter_totals(
+            int(n_contacts.sum()),
+            {type: int(n) for type, n in zip(self.location_types, location_contacts) if n},
+            age_group_contacts.tolist())
+
+        # pairs of an infectious and a susceptible human at the same location, one of them arriving
+        susceptible = self.population.is_susceptible(now) & self.active
+        src = np.flatnonzero(infectious[humans])
+        dst = np.flatnonzero(susceptible[humans])
+        if len(src) == 0 or len(dst) == 0:
+            return
+        dst = dst[np.argsort(locations[dst], kind='stable')]
+        start = np.searchsorted(locations[dst], locations[src], side='left')
+        counts = np.searchsorted(locations[dst], locations[src], side='right') - start
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        dst = dst[np.repeat(start, counts) + offsets]
+        src = np.repeat(src, counts)
+        new_pair = arriving[src] | arriving[dst]
+        src, dst = src[new_pair], dst[new_pair]
+
+        # same contact and transmission conditions as `Human._resolve_encounters`
+        overlap = np.minimum(stay[src], stay[dst])
+        contact = (rng.random_sample(len(src)) < p_close[locations[src]]) & (rng.random_sample(len(src)) * overlap > INFECTION_DURATION)
+        p_infection = self._infectiousness(now, severe, cough)[humans[src]]
+        infected = contact & (rng.random_sample(len(src)) < p_infection * CONTAGION_KNOB)
+
+        src, dst = src[infected], dst[infected]
+        _, first = np.unique(humans[dst], return_index=True)
+        for k in np.sort(first):
+            self._infect(self.humans[humans[dst[k]]], self.locations[locations[dst[k]]], source=self.humans[humans[src[k]]])
+
+    def _environmental_transmission(self, now, humans, locations):
+        """ Infection from the contaminated surfaces of the locations left in this step (see `Location.contamination_probability`) """
+        lag = (now - self.contamination_tick) * TICK_MINUTE / (24 * 60) # DAYS
+        contamination = np.where(lag <= self.max_day_contamination, self.social_contact_factor * (1 - lag / self.max_day_contamination), 0)
+        p_infection = ENVIRONMENTAL_INFECTION_KNOB * np.nan_to_num(contamination)[locations]
+
+        susceptible = self.population.is_susceptible(now) & self.active
+        infected = susceptible[humans] & (p_infection > 0) & (self.rng.random_sample(len(humans)) < p_infection)
+        _, first = np.unique(humans[infected], return_index=True)
+        for k in np.sort(first):
+            self._infect(self.humans[humans[infected][k]], self.locations[locations[infected][k]])